@@ -1,15 +1,22 @@
+import os
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
 from alembic import context
-from lib.models import Base, Author, Publisher, Book
+from lib.models import Base, Author, Publisher, Book, DATABASE_URL_ENV
 
 config = context.config
 fileConfig(config.config_file_name)
+if os.environ.get(DATABASE_URL_ENV):
+    config.set_main_option("sqlalchemy.url", os.environ[DATABASE_URL_ENV].replace("%", "%%"))
 target_metadata = Base.metadata
 
+def include_name(name, type_, parent_names):
+    # FTS5 virtual tables and their shadow tables are managed by hand-written revisions.
+    return not (type_ == "table" and "_fts" in name)
+
 def run_migrations_offline():
     url = config.get_main_option("sqlalchemy.url")
-    context.configure(url=url, target_metadata=target_metadata, literal_binds=True)
+    context.configure(url=url, target_metadata=target_metadata, literal_binds=True, include_name=include_name)
     with context.begin_transaction():
         context.run_migrations()
 
@@ -17,7 +24,7 @@ def run_migrations_online():
     connectable = engine_from_config(
         config.get_section(config.config_ini_section), prefix='sqlalchemy.', poolclass=pool.NullPool)
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
         with context.begin_transaction():
             context.run_migrations()
 
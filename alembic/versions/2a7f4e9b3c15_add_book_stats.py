@@ -0,0 +1,63 @@
+"""Add book_stats report summaries
+
+Revision ID: 2a7f4e9b3c15
+Revises: 5e2d8c1f7a90
+Create Date: 2026-10-18 16:41:52.377120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a7f4e9b3c15'
+down_revision = '5e2d8c1f7a90'
+branch_labels = None
+depends_on = None
+
+STAT_KEYS = {
+    'genre': '{row}.genre',
+    'decade': 'CAST(({row}.publication_year / 10) * 10 AS TEXT)',
+    'author': 'CAST({row}.author_id AS TEXT)',
+    'publisher': 'CAST({row}.publisher_id AS TEXT)'
+}
+
+def _count_book(row):
+    return ''.join(
+        f"""INSERT INTO book_stats (dimension, key, book_count) VALUES ('{dimension}', {key.format(row=row)}, 1)
+            ON CONFLICT (dimension, key) DO UPDATE SET book_count = book_count + 1;"""
+        for dimension, key in STAT_KEYS.items()
+    )
+
+def _uncount_book(row):
+    return ''.join(
+        f"""UPDATE book_stats SET book_count = book_count - 1
+            WHERE dimension = '{dimension}' AND key = {key.format(row=row)};
+            DELETE FROM book_stats WHERE dimension = '{dimension}' AND key = {key.format(row=row)} AND book_count <= 0;"""
+        for dimension, key in STAT_KEYS.items()
+    )
+
+def upgrade():
+    op.create_table('book_stats',
+    sa.Column('dimension', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('book_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'key')
+    )
+    # Only SQLite keeps book_stats (see models.py); reports count live elsewhere.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for dimension, key in STAT_KEYS.items():
+        key = key.format(row='books')
+        op.execute(f"""INSERT INTO book_stats (dimension, key, book_count)
+            SELECT '{dimension}', {key}, COUNT(*) FROM books GROUP BY {key}""")
+    op.execute(f"CREATE TRIGGER books_stats_ai AFTER INSERT ON books BEGIN {_count_book('new')} END")
+    op.execute(f"CREATE TRIGGER books_stats_ad AFTER DELETE ON books BEGIN {_uncount_book('old')} END")
+    op.execute(f"""CREATE TRIGGER books_stats_au AFTER UPDATE OF genre, publication_year, author_id, publisher_id ON books
+        BEGIN {_uncount_book('old')} {_count_book('new')} END""")
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('au', 'ad', 'ai'):
+            op.execute(f"DROP TRIGGER IF EXISTS books_stats_{trigger}")
+    op.drop_table('book_stats')
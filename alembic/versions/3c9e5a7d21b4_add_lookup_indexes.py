@@ -0,0 +1,28 @@
+"""Add lookup indexes
+
+Revision ID: 3c9e5a7d21b4
+Revises: f744c61605b6
+Create Date: 2026-10-18 09:12:41.530218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e5a7d21b4'
+down_revision = 'f744c61605b6'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_authors_first_name_last_name', 'authors', ['first_name', 'last_name'], unique=False)
+    op.create_index(op.f('ix_books_author_id'), 'books', ['author_id'], unique=False)
+    op.create_index(op.f('ix_books_publisher_id'), 'books', ['publisher_id'], unique=False)
+    op.create_index('ix_books_genre_publication_year', 'books', ['genre', 'publication_year'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_books_genre_publication_year', table_name='books')
+    op.drop_index(op.f('ix_books_publisher_id'), table_name='books')
+    op.drop_index(op.f('ix_books_author_id'), table_name='books')
+    op.drop_index('ix_authors_first_name_last_name', table_name='authors')
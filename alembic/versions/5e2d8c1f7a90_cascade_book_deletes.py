@@ -0,0 +1,60 @@
+"""Cascade book deletes in the database
+
+Revision ID: 5e2d8c1f7a90
+Revises: 9b1f0e6c4a27
+Create Date: 2026-10-18 14:26:05.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2d8c1f7a90'
+down_revision = '9b1f0e6c4a27'
+branch_labels = None
+depends_on = None
+
+# The initial schema left the foreign keys unnamed; this convention lets batch
+# mode find them when it rebuilds the table.
+NAMING_CONVENTION = {
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+}
+
+BOOKS_FTS_TRIGGERS = [
+    """CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, genre) VALUES (new.id, new.title, new.genre);
+    END""",
+    """CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, genre) VALUES ('delete', old.id, old.title, old.genre);
+    END""",
+    """CREATE TRIGGER books_fts_au AFTER UPDATE OF title, genre ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, genre) VALUES ('delete', old.id, old.title, old.genre);
+        INSERT INTO books_fts(rowid, title, genre) VALUES (new.id, new.title, new.genre);
+    END""",
+]
+
+def _rebuild_foreign_keys(ondelete):
+    if op.get_bind().dialect.name != 'sqlite':
+        # Other backends alter the constraints in place, under the names they gave them.
+        for fk in sa.inspect(op.get_bind()).get_foreign_keys('books'):
+            op.drop_constraint(fk['name'], 'books', type_='foreignkey')
+            op.create_foreign_key(fk['name'], 'books', fk['referred_table'], fk['constrained_columns'],
+                                  fk['referred_columns'], ondelete=ondelete)
+        return
+    # Rebuilding the table drops its triggers, so the FTS triggers are recreated.
+    with op.batch_alter_table('books', recreate='always', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint('fk_books_author_id_authors', type_='foreignkey')
+        batch_op.drop_constraint('fk_books_publisher_id_publishers', type_='foreignkey')
+        batch_op.create_foreign_key('fk_books_author_id_authors', 'authors', ['author_id'], ['id'],
+                                    ondelete=ondelete)
+        batch_op.create_foreign_key('fk_books_publisher_id_publishers', 'publishers', ['publisher_id'], ['id'],
+                                    ondelete=ondelete)
+    for statement in BOOKS_FTS_TRIGGERS:
+        op.execute(statement)
+
+def upgrade():
+    _rebuild_foreign_keys('CASCADE')
+
+def downgrade():
+    _rebuild_foreign_keys(None)
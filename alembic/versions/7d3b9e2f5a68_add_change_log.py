@@ -0,0 +1,57 @@
+"""Add change_log for change data capture
+
+Revision ID: 7d3b9e2f5a68
+Revises: 2a7f4e9b3c15
+Create Date: 2026-10-18 19:12:40.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3b9e2f5a68'
+down_revision = '2a7f4e9b3c15'
+branch_labels = None
+depends_on = None
+
+ENTITIES = {
+    'authors': 'author',
+    'publishers': 'publisher',
+    'books': 'book'
+}
+TRIGGERS = {
+    'ai': ('INSERT', 'new', 'insert'),
+    'au': ('UPDATE', 'new', 'update'),
+    'ad': ('DELETE', 'old', 'delete')
+}
+
+def upgrade():
+    op.create_table('change_log',
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('operation', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('seq'),
+    sqlite_autoincrement=True
+    )
+    op.create_index('ix_change_log_entity_entity_id_seq', 'change_log', ['entity', 'entity_id', 'seq'])
+    # The triggers that fill the log are SQLite-only, like the DDL in models.py.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    # Existing rows are logged as inserts, so a consumer starting from 0 sees the whole catalog.
+    for table, entity in ENTITIES.items():
+        op.execute(f"""INSERT INTO change_log (entity, entity_id, operation)
+            SELECT '{entity}', id, 'insert' FROM {table} ORDER BY id""")
+        for suffix, (event_name, row, operation) in TRIGGERS.items():
+            op.execute(f"""CREATE TRIGGER {table}_changes_{suffix} AFTER {event_name} ON {table} BEGIN
+                INSERT INTO change_log (entity, entity_id, operation) VALUES ('{entity}', {row}.id, '{operation}');
+            END""")
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in ENTITIES:
+            for suffix in TRIGGERS:
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_changes_{suffix}")
+    op.drop_index('ix_change_log_entity_entity_id_seq', table_name='change_log')
+    op.drop_table('change_log')
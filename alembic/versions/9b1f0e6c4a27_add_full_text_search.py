@@ -0,0 +1,61 @@
+"""Add full-text search
+
+Revision ID: 9b1f0e6c4a27
+Revises: 3c9e5a7d21b4
+Create Date: 2026-10-18 11:03:17.904652
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1f0e6c4a27'
+down_revision = '3c9e5a7d21b4'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # FTS5 and these triggers are SQLite-only, like the DDL in models.py.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""CREATE VIRTUAL TABLE authors_fts USING fts5(
+        first_name, last_name, content='authors', content_rowid='id', prefix='2 3')""")
+    op.execute("CREATE VIRTUAL TABLE authors_fts_vocab USING fts5vocab(authors_fts, 'row')")
+    op.execute("""CREATE TRIGGER authors_fts_ai AFTER INSERT ON authors BEGIN
+        INSERT INTO authors_fts(rowid, first_name, last_name) VALUES (new.id, new.first_name, new.last_name);
+    END""")
+    op.execute("""CREATE TRIGGER authors_fts_ad AFTER DELETE ON authors BEGIN
+        INSERT INTO authors_fts(authors_fts, rowid, first_name, last_name)
+        VALUES ('delete', old.id, old.first_name, old.last_name);
+    END""")
+    op.execute("""CREATE TRIGGER authors_fts_au AFTER UPDATE OF first_name, last_name ON authors BEGIN
+        INSERT INTO authors_fts(authors_fts, rowid, first_name, last_name)
+        VALUES ('delete', old.id, old.first_name, old.last_name);
+        INSERT INTO authors_fts(rowid, first_name, last_name) VALUES (new.id, new.first_name, new.last_name);
+    END""")
+    op.execute("INSERT INTO authors_fts(authors_fts) VALUES ('rebuild')")
+
+    op.execute("""CREATE VIRTUAL TABLE books_fts USING fts5(
+        title, genre, content='books', content_rowid='id', prefix='2 3')""")
+    op.execute("CREATE VIRTUAL TABLE books_fts_vocab USING fts5vocab(books_fts, 'row')")
+    op.execute("""CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, genre) VALUES (new.id, new.title, new.genre);
+    END""")
+    op.execute("""CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, genre) VALUES ('delete', old.id, old.title, old.genre);
+    END""")
+    op.execute("""CREATE TRIGGER books_fts_au AFTER UPDATE OF title, genre ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, genre) VALUES ('delete', old.id, old.title, old.genre);
+        INSERT INTO books_fts(rowid, title, genre) VALUES (new.id, new.title, new.genre);
+    END""")
+    op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in ('books', 'authors'):
+        for trigger in ('au', 'ad', 'ai'):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts_vocab")
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts")
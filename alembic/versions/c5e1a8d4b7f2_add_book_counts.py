@@ -0,0 +1,65 @@
+"""Add cached book_count to authors and publishers
+
+Revision ID: c5e1a8d4b7f2
+Revises: 7d3b9e2f5a68
+Create Date: 2026-10-18 20:03:11.274519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e1a8d4b7f2'
+down_revision = '7d3b9e2f5a68'
+branch_labels = None
+depends_on = None
+
+# table -> (entity name in change_log, columns whose updates are logged)
+CHANGE_LOGGED = {
+    'authors': ('author', 'first_name, last_name, birth_year, nationality'),
+    'publishers': ('publisher', 'name, founded_year, location, website')
+}
+
+def _add_to_counts(row, delta):
+    return f"""UPDATE authors SET book_count = book_count {delta} WHERE id = {row}.author_id;
+        UPDATE publishers SET book_count = book_count {delta} WHERE id = {row}.publisher_id;"""
+
+def _change_log_update_trigger(table, entity, columns=None):
+    event_name = f'UPDATE OF {columns}' if columns else 'UPDATE'
+    return f"""CREATE TRIGGER {table}_changes_au AFTER {event_name} ON {table} BEGIN
+        INSERT INTO change_log (entity, entity_id, operation) VALUES ('{entity}', new.id, 'update');
+    END"""
+
+def upgrade():
+    # The triggers are SQLite-only, like the DDL in models.py; elsewhere Author.book_count
+    # and Publisher.book_count count the books instead of reading the column.
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        # Count changes, the backfill included, are not catalog edits: keep them out of the change log.
+        for table, (entity, columns) in CHANGE_LOGGED.items():
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_changes_au")
+            op.execute(_change_log_update_trigger(table, entity, columns))
+    for table, column in (('authors', 'author_id'), ('publishers', 'publisher_id')):
+        op.add_column(table, sa.Column('book_count', sa.Integer(), nullable=False, server_default='0'))
+        if sqlite:
+            op.execute(f"""UPDATE {table} SET book_count = (
+                SELECT COUNT(*) FROM books WHERE books.{column} = {table}.id)""")
+    if not sqlite:
+        return
+    op.execute(f"CREATE TRIGGER books_counts_ai AFTER INSERT ON books BEGIN {_add_to_counts('new', '+ 1')} END")
+    op.execute(f"CREATE TRIGGER books_counts_ad AFTER DELETE ON books BEGIN {_add_to_counts('old', '- 1')} END")
+    op.execute(f"""CREATE TRIGGER books_counts_au AFTER UPDATE OF author_id, publisher_id ON books
+        WHEN old.author_id IS NOT new.author_id OR old.publisher_id IS NOT new.publisher_id
+        BEGIN {_add_to_counts('old', '- 1')} {_add_to_counts('new', '+ 1')} END""")
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table, (entity, columns) in CHANGE_LOGGED.items():
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_changes_au")
+            op.execute(_change_log_update_trigger(table, entity))
+        for trigger in ('au', 'ad', 'ai'):
+            op.execute(f"DROP TRIGGER IF EXISTS books_counts_{trigger}")
+    # A native DROP COLUMN (SQLite 3.35+) keeps the other triggers on these tables; batch mode would drop them.
+    for table in ('publishers', 'authors'):
+        op.drop_column(table, 'book_count')
@@ -0,0 +1,42 @@
+"""Add version_id to authors, publishers and books for optimistic locking
+
+Revision ID: e8a4f1c7d3b6
+Revises: c5e1a8d4b7f2
+Create Date: 2026-10-18 21:26:48.903152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a4f1c7d3b6'
+down_revision = 'c5e1a8d4b7f2'
+branch_labels = None
+depends_on = None
+
+TABLES = ('authors', 'publishers', 'books')
+BOOK_COLUMNS = 'title, publication_year, genre, author_id, publisher_id'  # logged updates, as in models.py
+
+def _books_change_log_update_trigger(columns=None):
+    event_name = f'UPDATE OF {columns}' if columns else 'UPDATE'
+    return f"""CREATE TRIGGER books_changes_au AFTER {event_name} ON books BEGIN
+        INSERT INTO change_log (entity, entity_id, operation) VALUES ('book', new.id, 'update');
+    END"""
+
+def upgrade():
+    # Existing rows start at version 1, like new ones.
+    for table in TABLES:
+        op.add_column(table, sa.Column('version_id', sa.Integer(), nullable=False, server_default='1'))
+    if op.get_bind().dialect.name == 'sqlite':
+        # Version bumps alone are not catalog edits: keep them out of the change log.
+        op.execute("DROP TRIGGER IF EXISTS books_changes_au")
+        op.execute(_books_change_log_update_trigger(BOOK_COLUMNS))
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS books_changes_au")
+        op.execute(_books_change_log_update_trigger())
+    # A native DROP COLUMN (SQLite 3.35+) keeps the triggers on these tables; batch mode would drop them.
+    for table in reversed(TABLES):
+        op.drop_column(table, 'version_id')
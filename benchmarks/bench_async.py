@@ -0,0 +1,81 @@
+"""Concurrent-request throughput: sync crud on a thread pool vs async_crud on one event loop.
+
+Each request opens its own session, fetches a random book with its author and
+publisher and then a page of books, as an HTTP handler would. Both sides use
+the same SQLite file and pool sizes.
+
+Run with: python benchmarks/bench_async.py [n_books]   (default 100,000)
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from catalog import build_session
+import async_crud
+import crud
+
+REQUESTS = 2000
+CONCURRENCY = [1, 8, 32]
+
+def request_ids(n_books):
+    rng = random.Random(42)
+    return [rng.randrange(n_books) + 1 for _ in range(REQUESTS)]
+
+def run_sync(engine, ids, concurrency):
+    Session = sessionmaker(bind=engine)
+    def handle(id):
+        with Session() as session:
+            crud.find_book_with_relations_by_id(session, id)
+            crud.get_books_page(session, after_id=id)
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(handle, ids))
+
+async def run_async(engine, ids, concurrency):
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    slots = asyncio.Semaphore(concurrency)
+    async def handle(id):
+        async with slots, Session() as session:
+            await async_crud.find_book_with_relations_by_id(session, id)
+            await async_crud.get_books_page(session, after_id=id)
+    await asyncio.gather(*(handle(id) for id in ids))
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return REQUESTS / (time.perf_counter() - start)
+
+async def async_rates(url, ids):
+    # One event loop for every run, so the pooled aiosqlite connections stay usable.
+    engine = async_crud.build_async_engine(url)
+    rates = []
+    for concurrency in CONCURRENCY:
+        start = time.perf_counter()
+        await run_async(engine, ids, concurrency)
+        rates.append(REQUESTS / (time.perf_counter() - start))
+    await engine.dispose()
+    return rates
+
+def main():
+    n_books = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    ids = request_ids(n_books)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine, session = build_session(n_books, url)
+        session.close()
+        sync = [timed(lambda: run_sync(engine, ids, concurrency)) for concurrency in CONCURRENCY]
+        engine.dispose()
+        async_ = asyncio.run(async_rates(url, ids))
+    print(f"{n_books} books, {REQUESTS} requests")
+    print(f"{'concurrency':>11} {'sync req/s':>11} {'async req/s':>12}")
+    for concurrency, sync_rate, async_rate in zip(CONCURRENCY, sync, async_):
+        print(f"{concurrency:>11} {sync_rate:>11.0f} {async_rate:>12.0f}")
+
+if __name__ == "__main__":
+    main()
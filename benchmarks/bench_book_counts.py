@@ -0,0 +1,58 @@
+"""Book counts and related-book paging vs loading the books collections.
+
+On a skewed 200k-book catalog, lists the first 50 publishers and 50 authors
+with their number of books, first through len(publisher.books) (one lazy
+load of every book per row), then from the cached book_count column. Then
+shows the first page of the biggest publisher's books, first by loading the
+whole collection (get_books_by_publisher), then with
+get_books_by_publisher_page.
+
+Run with: python benchmarks/bench_book_counts.py
+"""
+import time
+
+from catalog import build_skewed_session
+from crud import get_authors_page, get_books_by_publisher, get_books_by_publisher_page, get_publishers_page
+from profiling import PROFILER
+
+BOOKS = 200000
+PAGE = 50
+
+def counts_by_collection(session):
+    return [len(e.books) for e in get_publishers_page(session, 0, PAGE) + get_authors_page(session, 0, PAGE)]
+
+def counts_by_column(session):
+    return [e.book_count for e in get_publishers_page(session, 0, PAGE) + get_authors_page(session, 0, PAGE)]
+
+def first_page_by_collection(session):
+    return get_books_by_publisher(session, 1)[:PAGE]
+
+def first_page_by_query(session):
+    return get_books_by_publisher_page(session, 1, 0, PAGE)
+
+CASES = [
+    ("counts via .books", counts_by_collection),
+    ("counts via book_count", counts_by_column),
+    ("publisher 1, page via .books", first_page_by_collection),
+    ("publisher 1, page query", first_page_by_query),
+]
+
+def main():
+    engine, session = build_skewed_session(BOOKS)
+    PROFILER.enable(engine)
+    print(f"{BOOKS} books; publisher 1 has {get_publishers_page(session, 0, 1)[0].book_count}")
+    session.close()
+    results = {}
+    for name, case in CASES:
+        with PROFILER.action(name):
+            start = time.perf_counter()
+            results[name] = case(session)
+            elapsed = time.perf_counter() - start
+        session.close()
+        print(f"{name:<30} {elapsed * 1000:>9.1f} ms {PROFILER.actions[name].statements:>5} statements")
+    assert results["counts via .books"] == results["counts via book_count"]
+    PROFILER.disable(engine)
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Set-based updates and upserts vs the per-row ORM path the menus use.
+
+Recategorises all 50k books of a catalog, first by loading each book and
+setting its genre, as update_entity does, then with one update_books call.
+Then syncs 2k publishers from a feed (half new, half existing), first with a
+find and an update or create per row, then with one upsert_publishers call.
+Uses a file database, so commits pay for their sync as in the app.
+
+Run with: python benchmarks/bench_bulk_update.py
+"""
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+from catalog import build_session
+from crud import (create_publisher, find_publisher_by_name, persist, unit_of_work, update_books,
+                  upsert_publishers)
+from models import Book
+
+BOOKS = 50000
+FEED = 2000
+
+def per_row_update(session):
+    with unit_of_work(session, savepoints=False):
+        for book in session.scalars(select(Book).where(Book.genre == "Fiction")):
+            persist(session, lambda: setattr(book, "genre", "Literary Fiction"))
+
+def set_based_update(session):
+    update_books(session, {"genre": "Literary Fiction"}, genre="Fiction")
+
+def feed():
+    existing = BOOKS // 100
+    return [{"name": f"Publisher {i}", "founded_year": 1960, "location": "Mombasa", "website": f"p{i}.co.ke"}
+            for i in range(existing - FEED // 2, existing + FEED // 2)]
+
+def per_row_sync(session):
+    with unit_of_work(session, savepoints=False):
+        for row in feed():
+            publisher = find_publisher_by_name(session, row["name"])
+            if publisher:
+                persist(session, lambda: [setattr(publisher, key, value) for key, value in row.items()])
+            else:
+                create_publisher(session, **row)
+
+def upsert_sync(session):
+    upsert_publishers(session, feed())
+
+CASES = [
+    ("update 50k books, per row", per_row_update),
+    ("update 50k books, update_books", set_based_update),
+    (f"sync {FEED} publishers, per row", per_row_sync),
+    (f"sync {FEED} publishers, upsert", upsert_sync),
+]
+
+def main():
+    for name, case in CASES:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine, session = build_session(BOOKS, f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            start = time.perf_counter()
+            case(session)
+            elapsed = time.perf_counter() - start
+            session.close()
+            engine.dispose()
+        print(f"{name:<36} {elapsed:>7.2f}s")
+
+if __name__ == "__main__":
+    main()
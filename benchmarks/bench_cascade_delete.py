@@ -0,0 +1,71 @@
+"""Statements issued by delete_publisher/delete_author as the number of books grows.
+
+With ON DELETE CASCADE and passive_deletes the ORM no longer loads the books
+or sends a DELETE per book, so the counts stay flat. The "orm" columns switch
+passive_deletes off again to show the previous behaviour.
+
+Run with: python benchmarks/bench_cascade_delete.py
+"""
+import time
+
+from sqlalchemy import event, func, select, update
+from catalog import build_session
+from crud import delete_author, delete_publisher
+from models import Book, Publisher
+
+SIZES = [1000, 10000, 100000]
+
+class StatementCounter:
+    """Counts cursor executions, and parameter sets sent (executemany counts each row)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = 0
+        self.parameter_sets = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        self.parameter_sets += len(parameters) if executemany else 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self)
+
+def delete_through_orm(session, id):
+    relationship = Publisher.books.property
+    relationship.passive_deletes = False
+    try:
+        return delete_publisher(session, id)
+    finally:
+        relationship.passive_deletes = True
+
+def run(n_books, delete):
+    engine, session = build_session(n_books)
+    with engine.begin() as conn:
+        conn.execute(update(Book).values(publisher_id=1))  # one publisher owns every book
+    with StatementCounter(engine) as counter:
+        start = time.perf_counter()
+        delete(session, 1)
+        elapsed = time.perf_counter() - start
+    remaining = session.scalar(select(func.count()).select_from(Book))
+    session.close()
+    return counter, elapsed, remaining
+
+def main():
+    print(f"{'books':>7} {'passive stmts':>14} {'rows sent':>10} {'s':>7} {'orm stmts':>13} {'rows sent':>10} {'s':>7}")
+    for n in SIZES:
+        passive, passive_s, remaining = run(n, delete_publisher)
+        assert remaining == 0, "books were left behind"
+        loaded, loaded_s, _ = run(n, delete_through_orm)
+        print(f"{n:>7} {passive.statements:>14} {passive.parameter_sets:>10} {passive_s:>7.3f} "
+              f"{loaded.statements:>13} {loaded.parameter_sets:>10} {loaded_s:>7.3f}")
+    engine, session = build_session(1000)
+    with StatementCounter(engine) as counter:
+        delete_author(session, 1)
+    print(f"delete_author: {counter.statements} statements")
+
+if __name__ == "__main__":
+    main()
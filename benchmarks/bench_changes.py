@@ -0,0 +1,70 @@
+"""Downstream sync cost: re-exporting every table vs reading the change log.
+
+Builds a 200k-book catalog, records the latest seq, then makes 1000 writes
+(updates, creates and deletes, some repeated on the same rows). A consumer
+then catches up either by exporting authors, publishers and books again,
+as the nightly job did, or with iter_changes since the recorded seq. The
+log is then compacted.
+
+Run with: python benchmarks/bench_changes.py
+"""
+import os
+import random
+import tempfile
+import time
+
+from catalog import build_session
+from bulk import export_file
+from changes import compact_changes, iter_changes, latest_seq
+from crud import create_book, delete_book, find_book_by_id, persist, unit_of_work
+
+BOOKS = 200000
+WRITES = 1000
+
+def make_writes(session):
+    rng = random.Random(42)
+    with unit_of_work(session, savepoints=False):
+        for i in range(WRITES):
+            kind = i % 10
+            if kind < 7:
+                book = find_book_by_id(session, rng.randrange(1000) + 1)  # a hot set, so rows repeat
+                persist(session, lambda: setattr(book, "genre", rng.choice(["Mystery", "Poetry", "History"])))
+            elif kind < 9:
+                create_book(session, f"New Book {i}", 2024, "Fiction", 1, 1)
+            else:
+                delete_book(session, BOOKS - i)
+
+def full_export(session, tmp):
+    for entity_type in ("author", "publisher", "book"):
+        export_file(session, entity_type, os.path.join(tmp, f"{entity_type}s.jsonl"))
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, session = build_session(BOOKS, f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        since = latest_seq(session)
+        make_writes(session)
+        session.close()
+
+        start = time.perf_counter()
+        full_export(session, tmp)
+        session.close()
+        export_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        changes = sum(1 for _ in iter_changes(session, since))
+        session.close()
+        changes_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        removed = compact_changes(session)
+        compact_s = time.perf_counter() - start
+        remaining = sum(1 for _ in iter_changes(session, since))
+        session.close()
+        engine.dispose()
+    print(f"{BOOKS} books, {WRITES} writes")
+    print(f"{'full re-export':<30} {export_s * 1000:>9.1f} ms")
+    print(f"{'changes since last sync':<30} {changes_s * 1000:>9.1f} ms  ({changes} changes)")
+    print(f"{'compaction':<30} {compact_s * 1000:>9.1f} ms  ({removed} removed, {remaining} left to sync)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Concurrent editing: many writer processes updating the same few books.
+
+Each writer process repeatedly picks one of HOT_BOOKS books and adds 1 to
+its publication_year the way a librarian edits a record: load it, think for
+THINK_MS, save, each edit in a session of its own. "blind" saves with a
+plain UPDATE of the value read, as the menus used to. "versioned" saves
+through crud.persist, so the UPDATE checks version_id, a "database is
+locked" error is retried with backoff, and an edit that lost the race is
+reported as stale, reloaded and made again.
+
+Every successful save adds exactly 1, so afterwards the years must have
+grown by the number of saves; any shortfall is lost updates.
+
+Run with: python benchmarks/bench_concurrency.py
+"""
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import build_session
+from sqlalchemy import func, select, update
+from models import Book, Session, configure_engine
+from crud import persist
+
+BOOKS = 1000
+HOT_BOOKS = 100
+EDITS = 100  # per writer
+THINK_MS = 2
+WRITERS = (1, 2, 4, 8, 16)
+
+def _init_worker(url):
+    configure_engine(url)
+
+def _edit(session, mode, book_id):
+    book = session.get(Book, book_id)
+    year = book.publication_year
+    time.sleep(THINK_MS / 1000)
+    if mode == "blind":
+        statement = update(Book).where(Book.id == book_id).values(publication_year=year + 1)
+        persist(session, lambda: session.execute(statement))
+    else:
+        persist(session, lambda: setattr(book, "publication_year", year + 1))
+
+def _writer(mode, seed):
+    """Make EDITS edits; return (saves, stale edits redone, seconds)."""
+    rng = random.Random(seed)
+    saves = stale = 0
+    start = time.perf_counter()
+    for _ in range(EDITS):
+        book_id = rng.randrange(HOT_BOOKS) + 1
+        while True:
+            session = Session()
+            try:
+                _edit(session, mode, book_id)
+                saves += 1
+                break
+            except ValueError:
+                stale += 1
+            finally:
+                session.close()
+    return saves, stale, time.perf_counter() - start
+
+def _total_years(session):
+    total = session.scalar(select(func.sum(Book.publication_year)).where(Book.id <= HOT_BOOKS))
+    session.close()
+    return total
+
+def run(url, session, mode, writers):
+    before = _total_years(session)
+    with ProcessPoolExecutor(writers, initializer=_init_worker, initargs=(url,)) as pool:
+        results = list(pool.map(_writer, [mode] * writers, range(writers)))
+    saves = sum(r[0] for r in results)
+    stale = sum(r[1] for r in results)
+    seconds = max(r[2] for r in results)
+    lost = saves - (_total_years(session) - before)
+    return saves / seconds, stale, lost
+
+def main():
+    print(f"{HOT_BOOKS} hot books, {EDITS} edits per writer, {THINK_MS} ms think time, {os.cpu_count()} CPUs")
+    print(f"{'writers':>7} {'mode':<10} {'saves/s':>9} {'stale':>7} {'lost':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine, session = build_session(BOOKS, url)
+        for writers in WRITERS:
+            for mode in ("blind", "versioned"):
+                rate, stale, lost = run(url, session, mode, writers)
+                print(f"{writers:>7} {mode:<10} {rate:>9.0f} {stale:>7} {lost:>6}")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
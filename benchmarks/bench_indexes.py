@@ -0,0 +1,56 @@
+"""Lookup latency on the hot columns with and without the secondary indexes.
+
+Run with: python benchmarks/bench_indexes.py [n_books]   (default 1,000,000)
+"""
+import random
+import sys
+import time
+
+from catalog import build_session
+from crud import find_author_by_name, get_books_by_author, get_books_by_publisher
+from models import Base, Book
+
+LOOKUPS = 50
+
+def lookups(session, n_authors, n_publishers):
+    rng = random.Random(42)
+    def author_name():
+        i = rng.randrange(n_authors)
+        return f"First{i} Last{i}"
+
+    return {
+        "find_author_by_name": lambda: find_author_by_name(session, author_name()),
+        "get_books_by_author": lambda: get_books_by_author(session, rng.randrange(n_authors) + 1),
+        "get_books_by_publisher": lambda: get_books_by_publisher(session, rng.randrange(n_publishers) + 1),
+        "books by genre/year": lambda: session.query(Book).filter_by(genre="Fiction", publication_year=1999).all(),
+    }
+
+def measure(session, n_authors, n_publishers):
+    results = {}
+    for name, fn in lookups(session, n_authors, n_publishers).items():
+        start = time.perf_counter()
+        for _ in range(LOOKUPS):
+            fn()
+            session.expunge_all()
+        results[name] = (time.perf_counter() - start) / LOOKUPS * 1000
+    session.rollback()  # release the connection before the indexes are dropped/created
+    return results
+
+def main():
+    n_books = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    engine, session = build_session(n_books)
+    n_authors, n_publishers = max(1, n_books // 10), max(1, n_books // 100)
+    indexes = [index for table in Base.metadata.sorted_tables for index in table.indexes]
+    for index in indexes:
+        index.drop(engine)
+    before = measure(session, n_authors, n_publishers)
+    for index in indexes:
+        index.create(engine)
+    after = measure(session, n_authors, n_publishers)
+    print(f"{n_books} books, mean of {LOOKUPS} lookups")
+    print(f"{'lookup':<24} {'no index ms':>12} {'indexed ms':>11}")
+    for name in before:
+        print(f"{name:<24} {before[name]:>12.3f} {after[name]:>11.3f}")
+
+if __name__ == "__main__":
+    main()
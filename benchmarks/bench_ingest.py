@@ -0,0 +1,52 @@
+"""Book import throughput: bulk.import_file vs ingest_file with 1, 2 and 4 workers.
+
+Writes a JSONL feed of 100k books that name their author and publisher, so
+every row is decoded, validated and resolved, then imports it into a fresh
+file database per run. Parallel cleaning only pays off on a machine with
+spare cores; the single writer caps the total either way.
+
+Run with: python benchmarks/bench_ingest.py
+"""
+import json
+import os
+import tempfile
+import time
+
+from catalog import build_session
+from bulk import import_file
+from ingest import ingest_file
+
+BOOKS = 100000
+AUTHORS = BOOKS // 10  # build_session's catalog sizes
+PUBLISHERS = BOOKS // 100
+
+def write_feed(path):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(BOOKS):
+            f.write(json.dumps({"title": f"Feed Book {i}", "publication_year": 1950 + i % 70, "genre": "Fiction",
+                                "author_name": f"First{i % AUTHORS} Last{i % AUTHORS}",
+                                "publisher_name": f"Publisher {i % PUBLISHERS}"}) + "\n")
+
+def main():
+    print(f"{BOOKS} books, {os.cpu_count()} CPUs")
+    runs = [("bulk.import_file", lambda session, path: import_file(session, "book", path))]
+    for workers in (1, 2, 4):
+        runs.append((f"ingest_file, {workers} workers",
+                     lambda session, path, workers=workers: ingest_file(session, "book", path, workers)))
+    with tempfile.TemporaryDirectory() as tmp:
+        feed = os.path.join(tmp, "feed.jsonl")
+        write_feed(feed)
+        for i, (name, run) in enumerate(runs):
+            db = os.path.join(tmp, f"bench{i}.db")
+            engine, session = build_session(BOOKS, f"sqlite:///{db}")
+            start = time.perf_counter()
+            report = run(session, feed)
+            elapsed = time.perf_counter() - start
+            session.close()
+            engine.dispose()
+            print(f"{name:<26} {elapsed:>7.2f}s {report.inserted / elapsed:>9.0f} rows/s")
+            if hasattr(report, "format_timings"):
+                print(f"    {report.format_timings()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Query-count benchmark for the "List all books" path.
+
+Compares the old per-row author/publisher lookups with the eager-loaded
+listing in crud.get_all_books_with_relations at growing catalog sizes.
+
+Run with: python benchmarks/bench_list_books.py
+"""
+import time
+
+from sqlalchemy import event
+from catalog import build_session
+from crud import get_all_books, get_all_books_with_relations, find_author_by_id, find_publisher_by_id
+
+SIZES = [100, 1000, 10000]
+
+def per_row_listing(session):
+    for book in get_all_books(session):
+        author = find_author_by_id(session, book.author_id)
+        publisher = find_publisher_by_id(session, book.publisher_id)
+        f"{book.title} {author.full_name} {publisher.name}"
+
+def eager_listing(session):
+    for book in get_all_books_with_relations(session):
+        f"{book.title} {book.author.full_name} {book.publisher.name}"
+
+def measure(engine, session, fn):
+    counter = {"queries": 0}
+
+    def count(*args):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    start = time.perf_counter()
+    fn(session)
+    elapsed = time.perf_counter() - start
+    event.remove(engine, "before_cursor_execute", count)
+    session.expunge_all()
+    return counter["queries"], elapsed
+
+def main():
+    print(f"{'books':>8} {'per-row queries':>16} {'per-row s':>10} {'eager queries':>14} {'eager s':>8}")
+    for n in SIZES:
+        engine, session = build_session(n)
+        old_q, old_t = measure(engine, session, per_row_listing)
+        new_q, new_t = measure(engine, session, eager_listing)
+        print(f"{n:>8} {old_q:>16} {old_t:>10.3f} {new_q:>14} {new_t:>8.3f}")
+        session.close()
+
+if __name__ == "__main__":
+    main()
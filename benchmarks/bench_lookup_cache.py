@@ -0,0 +1,40 @@
+"""Repeated find_*_by_id/find_*_by_name lookups with and without the lookup cache.
+
+Run with: python benchmarks/bench_lookup_cache.py
+"""
+import random
+import time
+
+from catalog import build_session
+from cache import LOOKUP_CACHE
+from crud import find_author_by_id, find_publisher_by_id, find_author_by_name
+
+LOOKUPS = 20000
+HOT_IDS = 500
+
+def run(session, n_authors, n_publishers):
+    rng = random.Random(7)
+    start = time.perf_counter()
+    for _ in range(LOOKUPS):
+        i = rng.randrange(min(HOT_IDS, n_authors))
+        find_author_by_id(session, i + 1)
+        find_publisher_by_id(session, i % n_publishers + 1)
+        find_author_by_name(session, f"First{i} Last{i}")
+    return time.perf_counter() - start
+
+def main():
+    n_books = 100000
+    engine, session = build_session(n_books)
+    n_authors, n_publishers = n_books // 10, n_books // 100
+    maxsize = LOOKUP_CACHE.maxsize
+    LOOKUP_CACHE.maxsize = 0
+    uncached = run(session, n_authors, n_publishers)
+    session.commit()
+    LOOKUP_CACHE.maxsize = maxsize
+    LOOKUP_CACHE.hits = LOOKUP_CACHE.misses = 0
+    cached = run(session, n_authors, n_publishers)
+    print(f"{LOOKUPS * 3} lookups over {HOT_IDS} hot ids")
+    print(f"uncached: {uncached:.3f}s  cached: {cached:.3f}s  stats: {LOOKUP_CACHE.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Time-to-first-row and peak memory of full vs keyset-paged book listing.
+
+Run with: python benchmarks/bench_pagination.py
+"""
+import time
+import tracemalloc
+
+from catalog import build_session
+from crud import get_all_books_with_relations, iter_books
+
+SIZES = [1000, 10000, 100000]
+
+def full_listing(session):
+    return iter(get_all_books_with_relations(session))
+
+def paged_listing(session):
+    return iter_books(session)
+
+def measure(session, listing):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = listing(session)
+    next(rows)
+    first_row = time.perf_counter() - start
+    for _ in rows:
+        pass
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    session.expunge_all()
+    return first_row, total, peak / 2 ** 20
+
+def main():
+    print(f"{'books':>8} {'full 1st s':>11} {'full MiB':>9} {'paged 1st s':>12} {'paged MiB':>10}")
+    for n in SIZES:
+        engine, session = build_session(n)
+        full_first, _, full_peak = measure(session, full_listing)
+        paged_first, _, paged_peak = measure(session, paged_listing)
+        print(f"{n:>8} {full_first:>11.4f} {full_peak:>9.1f} {paged_first:>12.4f} {paged_peak:>10.1f}")
+        session.close()
+
+if __name__ == "__main__":
+    main()
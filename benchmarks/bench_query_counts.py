@@ -0,0 +1,49 @@
+"""Statements sent per call of the common crud operations, recorded with the profiler.
+
+A change that adds queries to one of these shows up as a higher
+statements-per-call figure. On SQLite every transaction also costs a BEGIN and
+the lookup cache's PRAGMA data_version, which are included.
+
+Run with: python benchmarks/bench_query_counts.py [n_books]   (default 10,000)
+"""
+import random
+import sys
+
+from catalog import build_session
+from crud import (create_book, delete_book, find_author_by_id, find_book_with_relations_by_id, get_books_by_author,
+                  get_books_page, search_books)
+from profiling import PROFILER
+
+CALLS = 100
+
+def operations(session, n_books, n_authors):
+    rng = random.Random(42)
+    counter = iter(range(n_books, n_books + CALLS))
+    return {
+        "find_author_by_id": lambda: find_author_by_id(session, rng.randrange(n_authors) + 1),
+        "find_book_with_relations_by_id": lambda: find_book_with_relations_by_id(session, rng.randrange(n_books) + 1),
+        "get_books_page": lambda: get_books_page(session, rng.randrange(n_books)),
+        "get_books_by_author": lambda: get_books_by_author(session, rng.randrange(n_authors) + 1),
+        "search_books": lambda: search_books(session, "golden river"),
+        "create_book": lambda: create_book(session, f"New Book {next(counter)}", 2001, "Fiction", 1, 1),
+        "delete_book": lambda: delete_book(session, rng.randrange(n_books) + 1),
+    }
+
+def main():
+    n_books = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    engine, session = build_session(n_books)
+    PROFILER.enable(engine)
+    for name, operation in operations(session, n_books, max(1, n_books // 10)).items():
+        for _ in range(CALLS):
+            with PROFILER.action(name):
+                operation()
+            session.commit()
+            session.expunge_all()
+    PROFILER.disable(engine)
+    print(f"{n_books} books, {CALLS} calls each")
+    print(f"{'operation':<32} {'stmts/call':>10} {'ms/call':>8}")
+    for name, stats in PROFILER.actions.items():
+        print(f"{name:<32} {stats.statements / stats.calls:>10.2f} {stats.total_ms / stats.calls:>8.3f}")
+
+if __name__ == "__main__":
+    main()
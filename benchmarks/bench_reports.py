@@ -0,0 +1,31 @@
+"""Report latency from the book_stats summary table vs GROUP BY over books.
+
+Run with: python benchmarks/bench_reports.py [n_books]   (default 1,000,000)
+"""
+import sys
+import time
+
+from catalog import build_session
+from reports import REPORTS
+
+RUNS = 5
+
+def measure(session, report, live):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        rows = report(session, live=live)
+    return (time.perf_counter() - start) / RUNS * 1000, rows
+
+def main():
+    n_books = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    engine, session = build_session(n_books)
+    print(f"{n_books} books, mean of {RUNS} runs")
+    print(f"{'report':<10} {'GROUP BY ms':>12} {'summary ms':>11}")
+    for name, report in REPORTS.items():
+        live_ms, live_rows = measure(session, report, True)
+        summary_ms, summary_rows = measure(session, report, False)
+        assert live_rows == summary_rows, name
+        print(f"{name:<10} {live_ms:>12.3f} {summary_ms:>11.3f}")
+
+if __name__ == "__main__":
+    main()
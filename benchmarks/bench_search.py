@@ -0,0 +1,33 @@
+"""Full-text search latency against a LIKE scan over book titles.
+
+Run with: python benchmarks/bench_search.py [n_books]   (default 1,000,000)
+"""
+import sys
+import time
+
+from catalog import build_session
+from crud import search_books
+from models import Book
+
+QUERIES = ["crimson river", "gold", "midnite storm", "wolf amber 39"]
+REPEATS = 20
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn()
+    return (time.perf_counter() - start) / REPEATS * 1000, len(result)
+
+def main():
+    n_books = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    engine, session = build_session(n_books)
+    print(f"{n_books} books, mean of {REPEATS} runs")
+    print(f"{'query':<16} {'fts ms':>8} {'hits':>5} {'LIKE ms':>8} {'hits':>5}")
+    for query in QUERIES:
+        fts_ms, fts_hits = timed(lambda: search_books(session, query))
+        pattern = "%" + query.split()[0] + "%"
+        like_ms, like_hits = timed(lambda: session.query(Book).filter(Book.title.ilike(pattern)).limit(20).all())
+        print(f"{query:<16} {fts_ms:>8.2f} {fts_hits:>5} {like_ms:>8.2f} {like_hits:>5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Browsing cost of the ORM vs a memory-mapped snapshot of the same catalog.
+
+Each path runs in a fresh interpreter, so load time includes its imports and
+peak RSS is its own. "first page" is import + connect/open + the first
+list_entity page; "list all" renders every book the way list_entity does;
+lookups are 1,000 find-by-id and 200 books-by-author calls.
+
+Run with: python benchmarks/bench_snapshot.py [n_books]   (default 200,000)
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+LOOKUPS = 1000
+RELATED = 200
+
+def peak_rss_mb():
+    # VmHWM starts afresh at exec; ru_maxrss would include the parent that built the catalog.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def browse(mode, path, n_books):
+    """Child process: time the browsing steps against the database or the snapshot."""
+    start = time.perf_counter()
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+    from main import format_entity
+    if mode == "orm":
+        import crud as api
+        from models import configure_engine, Session
+        configure_engine(f"sqlite:///{path}")
+        session = Session()
+    else:
+        import snapshot as api
+        session = api.open_snapshot(path)
+    for book in api.get_books_page(session, 0, 50):
+        format_entity("book", book)
+    first_page = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for book in api.iter_books(session):
+        format_entity("book", book)
+    list_all = time.perf_counter() - start
+
+    rng = random.Random(42)
+    start = time.perf_counter()
+    for _ in range(LOOKUPS):
+        api.find_book_with_relations_by_id(session, rng.randrange(n_books) + 1)
+    find = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(RELATED):
+        api.get_books_by_author(session, rng.randrange(n_books // 10) + 1)
+    related = time.perf_counter() - start
+    print(json.dumps({"first_page": first_page, "list_all": list_all, "find": find, "related": related,
+                      "rss_mb": peak_rss_mb()}))
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        return browse(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    n_books = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    from catalog import build_skewed_session
+    import snapshot
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, snap_path = os.path.join(tmp, "bench.db"), os.path.join(tmp, "bench.snap")
+        engine, session = build_skewed_session(n_books, f"sqlite:///{db_path}")
+        start = time.perf_counter()
+        snapshot.export_snapshot(session, snap_path)
+        export = time.perf_counter() - start
+        session.close()
+        engine.dispose()
+        results = {}
+        for mode, path in (("orm", db_path), ("snapshot", snap_path)):
+            child = subprocess.run([sys.executable, __file__, "--child", mode, path, str(n_books)],
+                                   capture_output=True, text=True, check=True)
+            results[mode] = json.loads(child.stdout)
+        print(f"{n_books} books; export took {export:.2f}s, snapshot is "
+              f"{os.path.getsize(snap_path) / 2**20:.1f} MiB, database {os.path.getsize(db_path) / 2**20:.1f} MiB")
+    print(f"{'':<22} {'ORM':>10} {'snapshot':>10}")
+    for key, label, scale, unit in (("first_page", "first page", 1000, "ms"), ("list_all", "list all books", 1, "s"),
+                                    ("find", f"{LOOKUPS} find by id", 1000, "ms"),
+                                    ("related", f"{RELATED} books by author", 1000, "ms"),
+                                    ("rss_mb", "peak RSS", 1, "MiB")):
+        print(f"{label + ' (' + unit + ')':<22} {results['orm'][key] * scale:>10.1f} "
+              f"{results['snapshot'][key] * scale:>10.1f}")
+
+if __name__ == "__main__":
+    main()
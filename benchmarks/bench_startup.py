@@ -0,0 +1,59 @@
+"""Import-time budget for the CLI entry point.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter, prints
+the slowest imports, and times `main.py --help` end to end. Exits with
+status 1 if importing main takes longer than the budget or pulls in
+SQLAlchemy, which should only load once the database is first used.
+
+Run with: python benchmarks/bench_startup.py [budget_ms]   (default 100)
+"""
+import os
+import subprocess
+import sys
+import time
+
+LIB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib')
+BUDGET_MS = 100
+RUNS = 5
+SHOW = 10
+
+def import_times():
+    """(module, self µs, cumulative µs) for every import made by `import main`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=LIB_DIR,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return rows
+
+def help_ms():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(LIB_DIR, "main.py"), "--help"], capture_output=True, check=True)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    # Best of RUNS, so a busy machine does not fail the budget.
+    runs = [import_times() for _ in range(RUNS)]
+    rows = min(runs, key=lambda rows: next(c for name, own, c in rows if name == "main"))
+    main_ms = next(cumulative for name, own, cumulative in rows if name == "main") / 1000
+    print(f"{'module':<40} {'self ms':>8} {'cumulative ms':>14}")
+    for name, own, cumulative in sorted(rows, key=lambda row: -row[2])[:SHOW]:
+        print(f"{name:<40} {own / 1000:>8.1f} {cumulative / 1000:>14.1f}")
+    print(f"\nimport main: {main_ms:.1f} ms (budget {budget_ms:g} ms)")
+    print(f"main.py --help: {min(help_ms() for _ in range(RUNS)):.1f} ms wall, including interpreter startup")
+    failures = []
+    if main_ms > budget_ms:
+        failures.append(f"import main took {main_ms:.1f} ms, over the {budget_ms:g} ms budget")
+    heavy = sorted({name for name, own, cumulative in rows if name.split(".")[0] == "sqlalchemy"})
+    if heavy:
+        failures.append(f"import main loads SQLAlchemy ({heavy[0]}, ...)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
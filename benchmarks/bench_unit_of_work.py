@@ -0,0 +1,48 @@
+"""Throughput of 10k create_author calls: commit per call vs one unit of work.
+
+Uses a file database so every commit pays for its sync, as in the app.
+
+Run with: python benchmarks/bench_unit_of_work.py
+"""
+import os
+import tempfile
+import time
+
+from catalog import build_session
+from crud import create_author, unit_of_work
+
+INSERTS = 10000
+
+def insert_authors(session):
+    for i in range(INSERTS):
+        create_author(session, f"First{i}", f"Last{i}", 1950, "Kenyan")
+
+def commit_per_call(session):
+    insert_authors(session)
+
+def one_transaction(savepoints):
+    def run(session):
+        with unit_of_work(session, savepoints=savepoints):
+            insert_authors(session)
+    return run
+
+MODES = {
+    "commit per call": commit_per_call,
+    "unit of work + savepoints": one_transaction(True),
+    "unit of work, no savepoints": one_transaction(False),
+}
+
+def main():
+    print(f"{INSERTS} inserts")
+    for name, mode in MODES.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            engine, session = build_session(0, f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            start = time.perf_counter()
+            mode(session)
+            elapsed = time.perf_counter() - start
+            session.close()
+            engine.dispose()
+        print(f"{name:<28} {elapsed:>7.2f}s {INSERTS / elapsed:>9.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Throwaway catalogs for the benchmark scripts, in memory or in a database file."""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from models import Base, Author, Publisher, Book, build_engine
+
+WORDS = ["amber", "ancient", "bitter", "broken", "crimson", "distant", "empty", "endless", "fallen", "frozen",
+         "gentle", "golden", "hidden", "hollow", "iron", "last", "lost", "midnight", "quiet", "restless",
+         "river", "garden", "harvest", "kingdom", "lantern", "market", "mountain", "ocean", "orchard", "shadow",
+         "silence", "stone", "storm", "summer", "thunder", "valley", "voyage", "water", "winter", "wolf"]
+
+def title(i):
+    return f"{WORDS[i % len(WORDS)].title()} {WORDS[i // len(WORDS) % len(WORDS)].title()} {i}"
+
+def build_session(n_books, url='sqlite://'):
+    """Create a fresh database holding n_books books and return (engine, session)."""
+    engine = build_engine(url)
+    Base.metadata.create_all(engine)
+    n_authors = max(1, n_books // 10)
+    n_publishers = max(1, n_books // 100)
+    if not n_books:
+        return engine, sessionmaker(bind=engine)()
+    with engine.begin() as conn:
+        conn.execute(insert(Author), [
+            {"id": i + 1, "first_name": f"First{i}", "last_name": f"Last{i}",
+             "birth_year": 1900 + i % 100, "nationality": "Kenyan"}
+            for i in range(n_authors)
+        ])
+        conn.execute(insert(Publisher), [
+            {"id": i + 1, "name": f"Publisher {i}", "founded_year": 1950, "location": "Nairobi"}
+            for i in range(n_publishers)
+        ])
+        conn.execute(insert(Book), [
+            {"title": title(i), "publication_year": 2000, "genre": "Fiction",
+             "author_id": i % n_authors + 1, "publisher_id": i % n_publishers + 1}
+            for i in range(n_books)
+        ])
+    return engine, sessionmaker(bind=engine)()
+
+GENRES = ["Fiction", "Mystery", "Romance", "Fantasy", "Science Fiction", "Biography", "History", "Poetry",
+          "Children", "Self-Help"]
+NATIONALITIES = ["Kenyan", "Nigerian", "British", "American", "Indian", "French", "Japanese", "Brazilian"]
+CHUNK_SIZE = 50000
+
+def zipf_weights(n, s=1.1):
+    """Cumulative Zipf weights for picking among n items: item 0 is the most popular."""
+    total = 0.0
+    cumulative = []
+    for rank in range(1, n + 1):
+        total += 1 / rank ** s
+        cumulative.append(total)
+    return cumulative
+
+def generate_catalog(n_books, seed=42):
+    """Yield (model, rows) chunks for a deterministic, skewed catalog of n_books books.
+
+    Publishers and authors are picked with Zipf weights, so a few publishers
+    own most titles and a few authors write many books; genres follow fixed
+    weights and publication years lean towards the present. The same
+    n_books and seed always give the same rows. Chunks hold at most
+    CHUNK_SIZE rows so 10M-book catalogs can be generated in bounded memory.
+    """
+    rng = random.Random(seed)
+    n_authors = max(1, n_books // 10)
+    n_publishers = max(1, n_books // 100)
+    for start in range(0, n_authors, CHUNK_SIZE):
+        yield Author, [
+            {"id": i + 1, "first_name": f"First{i}", "last_name": f"Last{i}",
+             "birth_year": rng.randrange(1900, 2000), "nationality": rng.choice(NATIONALITIES)}
+            for i in range(start, min(start + CHUNK_SIZE, n_authors))
+        ]
+    for start in range(0, n_publishers, CHUNK_SIZE):
+        yield Publisher, [
+            {"id": i + 1, "name": f"Publisher {i}", "founded_year": rng.randrange(1800, 2020),
+             "location": "Nairobi", "website": f"https://publisher{i}.example"}
+            for i in range(start, min(start + CHUNK_SIZE, n_publishers))
+        ]
+    authors, publishers = zipf_weights(n_authors), zipf_weights(n_publishers)
+    genre_weights = [30, 15, 12, 10, 8, 7, 7, 4, 4, 3]
+    for start in range(0, n_books, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, n_books - start)
+        author_ids = rng.choices(range(1, n_authors + 1), cum_weights=authors, k=size)
+        publisher_ids = rng.choices(range(1, n_publishers + 1), cum_weights=publishers, k=size)
+        genres = rng.choices(GENRES, weights=genre_weights, k=size)
+        yield Book, [
+            {"id": start + j + 1, "title": title(start + j),
+             "publication_year": max(1800, 2024 - int(rng.expovariate(1 / 30))), "genre": genres[j],
+             "author_id": author_ids[j], "publisher_id": publisher_ids[j]}
+            for j in range(size)
+        ]
+
+def build_skewed_session(n_books, url='sqlite://', seed=42):
+    """Like build_session, but filled from generate_catalog(n_books, seed)."""
+    engine = build_engine(url)
+    Base.metadata.create_all(engine)
+    for model, rows in generate_catalog(n_books, seed):
+        with engine.begin() as conn:
+            conn.execute(insert(model), rows)
+    return engine, sessionmaker(bind=engine)()
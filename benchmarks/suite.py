@@ -0,0 +1,431 @@
+"""Repeatable benchmarks for every crud function and the list_entity rendering path.
+
+Builds a skewed catalog with catalog.generate_catalog, times every benchmark,
+writes the results as JSON and, given the JSON of an earlier run as a
+baseline, reports what got slower or started sending more statements (and
+exits with status 1 if anything did). Every benchmark draws its ids from its
+own seeded generator, so two runs with the same --books and --seed do the
+same work.
+
+Each benchmark's calls are split over --trials rounds, interleaved with the
+other benchmarks' rounds, and the fastest round's median is kept, as timeit
+keeps the best repeat. The spread between the rounds' medians is saved as
+noise_ms, and a change smaller than the noise of either run is not reported
+as a regression. Statements are counted in a separate, untimed pass with the
+profiler on, so its overhead stays out of the timings.
+
+Run with:
+    python benchmarks/suite.py --books 100000 --output baseline.json
+    python benchmarks/suite.py --books 100000 --output new.json --baseline baseline.json
+"""
+import gc
+import itertools
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import time
+
+import click
+import sqlalchemy
+from click.testing import CliRunner
+
+from catalog import WORDS, build_skewed_session, title
+import crud
+from cache import LOOKUP_CACHE
+from main import list_entity
+from profiling import PROFILER
+
+DEFAULT_CALLS = 200
+FULL_SCAN_LIMIT = 1000000  # get_all_* load every row; skipped above this many books
+ITER_ROWS = 5000
+LIST_PAGES = 5
+TRIALS = 5
+THRESHOLD = 0.10
+MIN_CHANGE_MS = 0.05  # smaller differences in the median are noise, whatever the ratio
+COUNT_CALLS = 10  # calls per benchmark in the untimed pass that counts statements
+
+BENCHMARKS = {}  # name -> (function(run), calls, is_full_scan)
+
+def benchmark(name, calls=DEFAULT_CALLS, full_scan=False):
+    def register(fn):
+        BENCHMARKS[name] = (fn, calls, full_scan)
+        return fn
+    return register
+
+class Run:
+    """State handed to one benchmark: the session, catalog sizes and a seeded generator."""
+
+    def __init__(self, session, n_books, seed, name):
+        self.session = session
+        self.n_books = n_books
+        self.n_authors = max(1, n_books // 10)
+        self.n_publishers = max(1, n_books // 100)
+        self.rng = random.Random(f"{seed}:{name}")
+        self.counter = itertools.count()
+
+    def book_id(self):
+        return self.rng.randrange(self.n_books) + 1
+
+    def author_id(self):
+        return self.rng.randrange(self.n_authors) + 1
+
+    def publisher_id(self):
+        return self.rng.randrange(self.n_publishers) + 1
+
+    def words(self, n):
+        return " ".join(self.rng.choice(WORDS) for _ in range(n))
+
+    def tail_id(self, count):
+        """Ids counting down from count, i.e. the least popular rows under the Zipf skew."""
+        return count - next(self.counter)
+
+def _drain(rows, limit=ITER_ROWS):
+    for _ in itertools.islice(rows, limit):
+        pass
+
+def _list_pages(session, entity_type):
+    with CliRunner().isolation(input="n\n" * (LIST_PAGES - 1) + "q\n"):
+        list_entity(session, entity_type)
+
+@benchmark("validate_author", calls=1000)
+def _(run):
+    crud.validate_author("Ngugi", "wa Thiong'o", 1938, "Kenyan")
+
+@benchmark("validate_publisher", calls=1000)
+def _(run):
+    crud.validate_publisher("Heinemann", 1890, "London", None)
+
+@benchmark("validate_book", calls=1000)
+def _(run):
+    crud.validate_book("Weep Not, Child", 1964, "Fiction", 1, 1)
+
+@benchmark("find_author_by_id")
+def _(run):
+    crud.find_author_by_id(run.session, run.author_id())
+
+@benchmark("find_author_by_name")
+def _(run):
+    i = run.author_id() - 1
+    crud.find_author_by_name(run.session, f"First{i} Last{i}")
+
+@benchmark("find_publisher_by_id")
+def _(run):
+    crud.find_publisher_by_id(run.session, run.publisher_id())
+
+@benchmark("find_publisher_by_name")
+def _(run):
+    crud.find_publisher_by_name(run.session, f"Publisher {run.publisher_id() - 1}")
+
+@benchmark("find_book_by_id")
+def _(run):
+    crud.find_book_by_id(run.session, run.book_id())
+
+@benchmark("find_book_by_title")
+def _(run):
+    crud.find_book_by_title(run.session, title(run.book_id() - 1))
+
+@benchmark("find_book_with_relations_by_id")
+def _(run):
+    crud.find_book_with_relations_by_id(run.session, run.book_id())
+
+@benchmark("find_book_with_relations_by_title")
+def _(run):
+    crud.find_book_with_relations_by_title(run.session, title(run.book_id() - 1))
+
+@benchmark("get_book_relations")
+def _(run):
+    crud.get_book_relations(run.session, run.book_id())
+
+@benchmark("get_books_by_author")
+def _(run):
+    crud.get_books_by_author(run.session, run.author_id())
+
+@benchmark("get_books_by_publisher", calls=50)
+def _(run):
+    crud.get_books_by_publisher(run.session, run.publisher_id())
+
+@benchmark("get_books_by_author_page")
+def _(run):
+    crud.get_books_by_author_page(run.session, run.author_id())
+
+@benchmark("get_books_by_publisher_page")
+def _(run):
+    crud.get_books_by_publisher_page(run.session, run.publisher_id())
+
+@benchmark("get_authors_page")
+def _(run):
+    crud.get_authors_page(run.session, run.author_id())
+
+@benchmark("get_publishers_page")
+def _(run):
+    crud.get_publishers_page(run.session, run.publisher_id())
+
+@benchmark("get_books_page")
+def _(run):
+    crud.get_books_page(run.session, run.book_id())
+
+@benchmark("iter_authors", calls=5)
+def _(run):
+    _drain(crud.iter_authors(run.session))
+
+@benchmark("iter_publishers", calls=5)
+def _(run):
+    _drain(crud.iter_publishers(run.session))
+
+@benchmark("iter_books", calls=5)
+def _(run):
+    _drain(crud.iter_books(run.session))
+
+@benchmark("iter_books_by_author", calls=50)
+def _(run):
+    _drain(crud.iter_books_by_author(run.session, run.author_id()))
+
+@benchmark("iter_books_by_publisher", calls=5)
+def _(run):
+    _drain(crud.iter_books_by_publisher(run.session, run.publisher_id()))
+
+@benchmark("get_all_authors", calls=3, full_scan=True)
+def _(run):
+    crud.get_all_authors(run.session)
+
+@benchmark("get_all_publishers", calls=3, full_scan=True)
+def _(run):
+    crud.get_all_publishers(run.session)
+
+@benchmark("get_all_books", calls=1, full_scan=True)
+def _(run):
+    crud.get_all_books(run.session)
+
+@benchmark("get_all_books_with_relations", calls=1, full_scan=True)
+def _(run):
+    crud.get_all_books_with_relations(run.session)
+
+@benchmark("search_authors", calls=100)
+def _(run):
+    crud.search_authors(run.session, f"Last{run.author_id() - 1}")
+
+@benchmark("search_books", calls=100)
+def _(run):
+    crud.search_books(run.session, run.words(2))
+
+@benchmark("list_entity author", calls=20)
+def _(run):
+    _list_pages(run.session, "author")
+
+@benchmark("list_entity publisher", calls=20)
+def _(run):
+    _list_pages(run.session, "publisher")
+
+@benchmark("list_entity book", calls=20)
+def _(run):
+    _list_pages(run.session, "book")
+
+@benchmark("create_author")
+def _(run):
+    crud.create_author(run.session, "Bench", f"Author {next(run.counter)}", 1950, "Kenyan")
+
+@benchmark("create_publisher")
+def _(run):
+    crud.create_publisher(run.session, f"Bench Publisher {next(run.counter)}", 1950, "Nairobi", None)
+
+@benchmark("create_book")
+def _(run):
+    crud.create_book(run.session, f"Bench Book {next(run.counter)}", 2001, "Fiction", run.author_id(),
+                     run.publisher_id())
+
+@benchmark("persist")
+def _(run):
+    book = crud.find_book_by_id(run.session, run.book_id())
+    crud.persist(run.session, lambda: setattr(book, "genre", run.rng.choice(["Fiction", "Mystery"])))
+
+@benchmark("check_version")
+def _(run):
+    book = crud.find_book_by_id(run.session, run.book_id())
+    version_id = book.version_id
+    run.session.expire(book, ["version_id"])  # as after a commit: the check reloads the row
+    crud.check_version(book, version_id)
+
+@benchmark("update_authors")
+def _(run):
+    crud.update_authors(run.session, {"nationality": run.rng.choice(["Kenyan", "Nigerian"])}, id=run.author_id())
+
+@benchmark("update_publishers")
+def _(run):
+    crud.update_publishers(run.session, {"location": run.rng.choice(["Nairobi", "Lagos"])}, id=run.publisher_id())
+
+@benchmark("update_books", calls=20)
+def _(run):
+    crud.update_books(run.session, {"publication_year": run.rng.randrange(1900, 2020)},
+                      author_id=[run.author_id() for _ in range(10)])
+
+@benchmark("upsert_publishers", calls=20)
+def _(run):
+    crud.upsert_publishers(run.session, [
+        {"name": f"Publisher {run.publisher_id() - 1}", "founded_year": 1950, "location": "Nairobi",
+         "website": None} for _ in range(100)
+    ])
+
+@benchmark("upsert_books", calls=20)
+def _(run):
+    crud.upsert_books(run.session, [
+        {"title": title(run.book_id() - 1), "publication_year": 2001, "genre": "Fiction",
+         "author_id": run.author_id(), "publisher_id": run.publisher_id()} for _ in range(100)
+    ])
+
+@benchmark("unit_of_work", calls=20)
+def _(run):
+    with crud.unit_of_work(run.session):
+        for _ in range(100):
+            crud.create_author(run.session, "Bench", f"Unit {next(run.counter)}", 1950, "Kenyan")
+
+@benchmark("delete_book")
+def _(run):
+    crud.delete_book(run.session, run.tail_id(run.n_books))
+
+@benchmark("delete_author", calls=50)
+def _(run):
+    crud.delete_author(run.session, run.tail_id(run.n_authors))
+
+@benchmark("delete_publisher", calls=20)
+def _(run):
+    crud.delete_publisher(run.session, run.tail_id(run.n_publishers))
+
+def _time_calls(session, name, fn, run, calls):
+    LOOKUP_CACHE.clear()
+    gc.collect()
+    timings = []
+    for _ in range(calls):
+        gc.disable()  # as timeit does, so a collection lands outside the timed call
+        try:
+            start = time.perf_counter()
+            fn(run)
+            timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+        session.commit()
+        session.expunge_all()
+    return timings
+
+def _count_statements(session, name, fn, run, calls):
+    """Statements per call of fn, from calls untimed calls with the profiler on."""
+    LOOKUP_CACHE.clear()
+    for _ in range(calls):
+        with PROFILER.action(name):
+            fn(run)
+        session.commit()
+        session.expunge_all()
+    stats = PROFILER.actions[name]
+    return round(stats.statements / stats.calls, 2)
+
+def _summary(rounds, statements_per_call):
+    """Result of one benchmark from the timings of its rounds: the fastest round's figures, and the spread."""
+    medians = [statistics.median(timings) for timings in rounds]
+    timings = rounds[medians.index(min(medians))]
+    return {
+        "calls": sum(len(timings) for timings in rounds),
+        "trials": len(rounds),
+        "median_ms": round(min(medians), 4),
+        "noise_ms": round(max(medians) - min(medians), 4),
+        "p95_ms": round(sorted(timings)[int((len(timings) - 1) * 0.95)], 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "statements_per_call": statements_per_call
+    }
+
+def run_suite(n_books, seed=42, only=None, trials=TRIALS):
+    """Run trials rounds of every benchmark, one round of each in turn.
+
+    A slow spell of the machine then lands in one round of many benchmarks
+    rather than in every round of one.
+    """
+    names = [name for name, (fn, calls, full_scan) in BENCHMARKS.items()
+             if (not only or only in name) and not (full_scan and n_books > FULL_SCAN_LIMIT)]
+    engine, session = build_skewed_session(n_books, seed=seed)
+    PROFILER.reset()
+    # One Run per benchmark for every round, so writes carry on where the last round stopped.
+    runs = {name: Run(session, n_books, seed, name) for name in names}
+    rounds = {name: [] for name in names}
+    statements = {}
+    # The deletes come last, so no other benchmark draws an id they removed.
+    phases = [[name for name in names if not name.startswith("delete_")],
+              [name for name in names if name.startswith("delete_")]]
+    try:
+        for phase in phases:
+            for _ in range(trials):
+                for name in phase:
+                    fn, calls, full_scan = BENCHMARKS[name]
+                    rounds[name].append(_time_calls(session, name, fn, runs[name], max(1, calls // trials)))
+            PROFILER.enable(engine)
+            try:
+                for name in phase:
+                    fn, calls, full_scan = BENCHMARKS[name]
+                    statements[name] = _count_statements(session, name, fn, runs[name], min(calls, COUNT_CALLS))
+            finally:
+                PROFILER.disable(engine)
+    finally:
+        session.close()
+        engine.dispose()
+    return {
+        "meta": {"books": n_books, "seed": seed, "trials": trials, "python": platform.python_version(),
+                 "sqlalchemy": sqlalchemy.__version__, "sqlite": sqlite3.sqlite_version,
+                 "platform": platform.platform()},
+        "results": {name: _summary(rounds[name], statements[name]) for name in names}
+    }
+
+def compare(current, baseline, threshold=THRESHOLD):
+    """Return (report lines, number of regressions) for current vs baseline results."""
+    lines = []
+    if current["meta"]["books"] != baseline["meta"]["books"] or current["meta"]["seed"] != baseline["meta"]["seed"]:
+        lines.append("Warning: baseline was run with a different --books/--seed; timings are not comparable.")
+    lines.append(f"{'benchmark':<36} {'base ms':>9} {'new ms':>9} {'change':>8} {'stmts':>11}  status")
+    regressions = 0
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            lines.append(f"{name:<36} {'-':>9} {new['median_ms']:>9.3f} {'':>8} {new['statements_per_call']:>11}  new")
+            continue
+        change = new["median_ms"] / old["median_ms"] - 1 if old["median_ms"] else 0.0
+        noise = max(MIN_CHANGE_MS, old.get("noise_ms", 0), new.get("noise_ms", 0))
+        if abs(new["median_ms"] - old["median_ms"]) < noise:
+            change = 0.0
+        statements = f"{old['statements_per_call']:g}->{new['statements_per_call']:g}"
+        if new["statements_per_call"] > old["statements_per_call"] or change > threshold:
+            status = "REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        lines.append(f"{name:<36} {old['median_ms']:>9.3f} {new['median_ms']:>9.3f} {change:>+8.1%} {statements:>11}  {status}")
+    return lines, regressions
+
+@click.command()
+@click.option("--books", default=100000, show_default=True, help="Catalog size (10k-10M).")
+@click.option("--seed", default=42, show_default=True, help="Seed for the catalog and the benchmark inputs.")
+@click.option("--output", type=click.Path(dir_okay=False, writable=True), help="Write the results as JSON.")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False), help="Results JSON to compare against.")
+@click.option("--threshold", default=THRESHOLD, show_default=True,
+              help="Relative slowdown of the median that counts as a regression.")
+@click.option("--only", default=None, help="Only run benchmarks whose name contains this text.")
+@click.option("--trials", default=TRIALS, show_default=True,
+              help="Rounds per benchmark; the fastest round's median is kept.")
+def main(books, seed, output, baseline, threshold, only, trials):
+    current = run_suite(books, seed, only, trials)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if not baseline:
+        click.echo(f"{'benchmark':<36} {'median ms':>10} {'noise ms':>9} {'p95 ms':>9} {'stmts/call':>11}")
+        for name, result in current["results"].items():
+            click.echo(f"{name:<36} {result['median_ms']:>10.3f} {result['noise_ms']:>9.3f} {result['p95_ms']:>9.3f} "
+                       f"{result['statements_per_call']:>11g}")
+        return
+    with open(baseline, encoding="utf-8") as f:
+        lines, regressions = compare(current, json.load(f), threshold)
+    click.echo("\n".join(lines))
+    if regressions:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""Async counterparts of the crud functions, for serving the catalog from asyncio code.
+
+Same names, arguments and validation as crud.py, but every function is a
+coroutine taking an AsyncSession (iter_* are async generators). Relationship
+attributes cannot lazy-load under asyncio, so related books are fetched with
+their own query and books are returned with author and publisher loaded.
+A failed write rolls the session back and reloads the objects it holds, so
+they stay readable. Lookups do not go through the LOOKUP_CACHE.
+"""
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import ObjectDeletedError, StaleDataError
+from models import (Author, Publisher, Book, database_url, POOL_SIZE, MAX_OVERFLOW, POOL_RECYCLE,
+                    SQLITE_BUSY_TIMEOUT, _set_sqlite_pragmas, _begin_sqlite_transaction)
+from crud import (PAGE_SIZE, SEARCH_LIMIT, UPSERT_BATCH_SIZE, STALE_MESSAGE, validate_author, validate_publisher,
+                  validate_book, _search_ids, _validate_changes, _filter, _bump_version, _upsert_rows, _upsert_statement)
+
+# backend -> asyncio DBAPI driver used when the URL names a sync driver (or none)
+ASYNC_DRIVERS = {
+    'sqlite': 'aiosqlite',
+    'postgresql': 'asyncpg',
+    'mysql': 'aiomysql'
+}
+
+def async_database_url(url=None):
+    """Return url (default: database_url()) with its driver swapped for the asyncio one."""
+    url = make_url(url or database_url())
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS:
+        url = url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}')
+    return url
+
+def build_async_engine(url=None):
+    """Async version of models.build_engine: same pool sizes and SQLite pragmas."""
+    url = async_database_url(url)
+    if url.get_backend_name() == 'sqlite':
+        if url.database and url.database != ':memory:':
+            engine = create_async_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                                         connect_args={'timeout': SQLITE_BUSY_TIMEOUT})
+        else:
+            engine = create_async_engine(url)
+        event.listen(engine.sync_engine, 'connect', _set_sqlite_pragmas)
+        event.listen(engine.sync_engine, 'begin', _begin_sqlite_transaction)
+        return engine
+    return create_async_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                               pool_recycle=POOL_RECYCLE, pool_pre_ping=True)
+
+_async_engine = None
+
+def get_async_engine():
+    """Return the async engine, building it from database_url() on first use."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = build_async_engine()
+    return _async_engine
+
+def __getattr__(name):
+    # async_crud.ASYNC_ENGINE is created on first access instead of at import.
+    if name == 'ASYNC_ENGINE':
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class _LazyAsyncSessionmaker(async_sessionmaker):
+    """async_sessionmaker that binds to get_async_engine() when the first session is made."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get('bind') is None:
+            self.configure(bind=get_async_engine())
+        return super().__call__(**local_kw)
+
+# Attributes must stay readable after commit: reloading them would need an await.
+AsyncSession = _LazyAsyncSessionmaker(expire_on_commit=False)
+
+async def configure_async_engine(url):
+    """Point ASYNC_ENGINE and the AsyncSession factory at another database."""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = build_async_engine(url)
+    AsyncSession.configure(bind=_async_engine)
+    return _async_engine
+
+async def _commit(session):
+    try:
+        await session.commit()
+    except IntegrityError:
+        await _rollback(session)
+        raise
+    except (StaleDataError, ObjectDeletedError):
+        # The row's version_id moved on since it was loaded (see crud.persist).
+        await _rollback(session)
+        raise ValueError(STALE_MESSAGE)
+
+async def _rollback(session):
+    """Roll back, then reload every object the rollback expired.
+
+    The caller may still hold them, and reading an expired attribute needs an
+    await. Objects whose row is gone are expunged instead.
+    """
+    await session.rollback()
+    held = {}
+    for model, identity, _ in list(session.identity_map.keys()):
+        held.setdefault(model, []).append(identity[0])
+    for model, ids in held.items():
+        statement = (_books_with_relations() if model is Book else select(model)).execution_options(populate_existing=True)
+        found = set()
+        ids.sort()
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            chunk = ids[start:start + UPSERT_BATCH_SIZE]
+            found.update(row.id for row in await _all(session, statement.where(model.id.in_(chunk))))
+        for id in set(ids) - found:
+            obj = session.identity_map.get(session.identity_key(model, (id,)))
+            if obj is not None:
+                session.expunge(obj)
+
+async def _all(session, statement):
+    return (await session.scalars(statement)).all()
+
+async def _first(session, statement):
+    return (await session.scalars(statement.limit(1))).first()
+
+async def _get_page(session, statement, model, after_id=0, page_size=PAGE_SIZE):
+    """Return up to page_size rows with id greater than after_id, in id order."""
+    return await _all(session, statement.where(model.id > after_id).order_by(model.id).limit(page_size))
+
+async def _iter_pages(get_page, session, page_size):
+    """Yield rows one at a time, fetching them page by page on the id keyset."""
+    after_id = 0
+    while True:
+        page = await get_page(session, after_id, page_size)
+        if not page:
+            return
+        for row in page:
+            yield row
+        after_id = page[-1].id
+
+async def _search(session, statement, model, fts_table, query, limit):
+    # The FTS lookups are plain SQL; run the sync helpers on the session's greenlet.
+    def search(sync_session):
+        ids = _search_ids(sync_session, fts_table, query, limit)
+        rows = {row.id: row for row in sync_session.scalars(statement.where(model.id.in_(ids)))}
+        return [rows[id] for id in ids if id in rows]
+    return await session.run_sync(search)
+
+async def _update_where(session, model, values, criteria, unique_message=None):
+    statement = update(model).where(*_filter(model, criteria)).values(_bump_version(model, values))
+    try:
+        try:
+            result = await session.execute(statement)
+        except IntegrityError:
+            await _rollback(session)
+            raise
+        await _commit(session)  # rolls back itself
+    except IntegrityError:
+        if unique_message:
+            raise ValueError(unique_message)
+        raise
+    return result.rowcount
+
+async def _upsert(session, model, key, rows):
+    rows = list({row[key]: row for row in rows}.values())
+    if not rows:
+        return 0
+    statement = _upsert_statement(session, model, key, rows[0])
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        await session.execute(statement, rows[start:start + UPSERT_BATCH_SIZE])
+    await _commit(session)
+    # Loaded copies of the updated rows would otherwise keep their old values.
+    keys = {row[key] for row in rows}
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, model) and inspect(obj).dict.get(key) in keys:
+            session.expunge(obj)
+    return len(rows)
+
+async def _check_references(session, rows):
+    for model, column, message in ((Author, "author_id", "Author not found."),
+                                   (Publisher, "publisher_id", "Publisher not found.")):
+        ids = {row[column] for row in rows if column in row}
+        found = set()
+        ordered = sorted(ids)
+        for start in range(0, len(ordered), UPSERT_BATCH_SIZE):
+            found.update(await _all(session, select(model.id).where(model.id.in_(ordered[start:start + UPSERT_BATCH_SIZE]))))
+        if ids - found:
+            raise ValueError(message)
+
+def _forget_books(session, column, id):
+    # The database cascade removed these books; without expire-on-commit the
+    # session would otherwise keep handing out its copies. The column is read
+    # from the instance dict, so an unloaded one is skipped rather than awaited.
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, Book) and inspect(obj).dict.get(column) == id:
+            session.expunge(obj)
+
+async def create_author(session, first_name, last_name, birth_year, nationality):
+    validate_author(first_name, last_name, birth_year, nationality)
+    author = Author(first_name=first_name, last_name=last_name, birth_year=birth_year, nationality=nationality)
+    session.add(author)
+    await _commit(session)
+    return author
+
+async def delete_author(session, id):
+    author = await find_author_by_id(session, id)
+    if author:
+        await session.delete(author)
+        await _commit(session)
+        _forget_books(session, "author_id", id)
+        return True
+    return False
+
+async def get_all_authors(session):
+    return await _all(session, select(Author))
+
+async def get_authors_page(session, after_id=0, page_size=PAGE_SIZE):
+    return await _get_page(session, select(Author), Author, after_id, page_size)
+
+def iter_authors(session, page_size=PAGE_SIZE):
+    return _iter_pages(get_authors_page, session, page_size)
+
+async def find_author_by_id(session, id):
+    return await session.get(Author, id)
+
+async def find_author_by_name(session, full_name):
+    parts = full_name.split()
+    first_name = parts[0]
+    last_name = ' '.join(parts[1:]) if len(parts) > 1 else ''
+    return await _first(session, select(Author).filter_by(first_name=first_name, last_name=last_name))
+
+async def search_authors(session, query, limit=SEARCH_LIMIT):
+    return await _search(session, select(Author), Author, "authors_fts", query, limit)
+
+async def get_books_by_author(session, author_id):
+    return await _all(session, _books_with_relations().where(Book.author_id == author_id).order_by(Book.id))
+
+async def get_books_by_author_page(session, author_id, after_id=0, page_size=PAGE_SIZE):
+    return await _get_page(session, _books_with_relations().where(Book.author_id == author_id), Book, after_id,
+                           page_size)
+
+def iter_books_by_author(session, author_id, page_size=PAGE_SIZE):
+    async def get_page(session, after_id, page_size):
+        return await get_books_by_author_page(session, author_id, after_id, page_size)
+    return _iter_pages(get_page, session, page_size)
+
+async def update_authors(session, values, **criteria):
+    _validate_changes(validate_author, Author, values)
+    return await _update_where(session, Author, values, criteria)
+
+async def create_publisher(session, name, founded_year, location, website):
+    validate_publisher(name, founded_year, location, website)
+    publisher = Publisher(name=name, founded_year=founded_year, location=location, website=website)
+    session.add(publisher)
+    try:
+        await _commit(session)
+        return publisher
+    except IntegrityError:
+        raise ValueError("Publisher name must be unique.")
+
+async def delete_publisher(session, id):
+    publisher = await find_publisher_by_id(session, id)
+    if publisher:
+        await session.delete(publisher)
+        await _commit(session)
+        _forget_books(session, "publisher_id", id)
+        return True
+    return False
+
+async def get_all_publishers(session):
+    return await _all(session, select(Publisher))
+
+async def get_publishers_page(session, after_id=0, page_size=PAGE_SIZE):
+    return await _get_page(session, select(Publisher), Publisher, after_id, page_size)
+
+def iter_publishers(session, page_size=PAGE_SIZE):
+    return _iter_pages(get_publishers_page, session, page_size)
+
+async def find_publisher_by_id(session, id):
+    return await session.get(Publisher, id)
+
+async def find_publisher_by_name(session, name):
+    return await _first(session, select(Publisher).filter_by(name=name))
+
+async def get_books_by_publisher(session, publisher_id):
+    return await _all(session, _books_with_relations().where(Book.publisher_id == publisher_id).order_by(Book.id))
+
+async def get_books_by_publisher_page(session, publisher_id, after_id=0, page_size=PAGE_SIZE):
+    return await _get_page(session, _books_with_relations().where(Book.publisher_id == publisher_id), Book, after_id,
+                           page_size)
+
+def iter_books_by_publisher(session, publisher_id, page_size=PAGE_SIZE):
+    async def get_page(session, after_id, page_size):
+        return await get_books_by_publisher_page(session, publisher_id, after_id, page_size)
+    return _iter_pages(get_page, session, page_size)
+
+async def update_publishers(session, values, **criteria):
+    _validate_changes(validate_publisher, Publisher, values)
+    return await _update_where(session, Publisher, values, criteria, "Publisher name must be unique.")
+
+async def upsert_publishers(session, rows):
+    return await _upsert(session, Publisher, "name", _upsert_rows(validate_publisher, rows))
+
+async def create_book(session, title, publication_year, genre, author_id, publisher_id):
+    validate_book(title, publication_year, genre, author_id, publisher_id)
+    if not await find_author_by_id(session, author_id):
+        raise ValueError("Author not found.")
+    if not await find_publisher_by_id(session, publisher_id):
+        raise ValueError("Publisher not found.")
+    book = Book(title=title, publication_year=publication_year, genre=genre, author_id=author_id, publisher_id=publisher_id)
+    session.add(book)
+    try:
+        await _commit(session)
+        return book
+    except IntegrityError:
+        raise ValueError("Book title must be unique.")
+
+async def delete_book(session, id):
+    book = await find_book_by_id(session, id)
+    if book:
+        await session.delete(book)
+        await _commit(session)
+        return True
+    return False
+
+async def update_books(session, values, **criteria):
+    _validate_changes(validate_book, Book, values)
+    await _check_references(session, [values])
+    return await _update_where(session, Book, values, criteria, "Book title must be unique.")
+
+async def upsert_books(session, rows):
+    rows = _upsert_rows(validate_book, rows)
+    await _check_references(session, rows)
+    return await _upsert(session, Book, "title", rows)
+
+async def get_all_books(session):
+    return await _all(session, select(Book))
+
+async def find_book_by_id(session, id):
+    return await session.get(Book, id)
+
+async def find_book_by_title(session, title):
+    return await _first(session, select(Book).filter_by(title=title))
+
+def _books_with_relations():
+    """Book select that loads author and publisher in the same SELECT."""
+    return select(Book).options(joinedload(Book.author), joinedload(Book.publisher))
+
+async def get_all_books_with_relations(session):
+    return await _all(session, _books_with_relations().order_by(Book.id))
+
+async def get_books_page(session, after_id=0, page_size=PAGE_SIZE):
+    return await _get_page(session, _books_with_relations(), Book, after_id, page_size)
+
+def iter_books(session, page_size=PAGE_SIZE):
+    return _iter_pages(get_books_page, session, page_size)
+
+async def find_book_with_relations_by_id(session, id):
+    return await _first(session, _books_with_relations().where(Book.id == id))
+
+async def find_book_with_relations_by_title(session, title):
+    return await _first(session, _books_with_relations().where(Book.title == title))
+
+async def search_books(session, query, limit=SEARCH_LIMIT):
+    return await _search(session, _books_with_relations(), Book, "books_fts", query, limit)
+
+async def get_book_relations(session, book_id):
+    book = await find_book_with_relations_by_id(session, book_id)
+    if book:
+        return book.author, book.publisher
+    return None, None
@@ -0,0 +1,345 @@
+"""Streaming bulk import/export of authors, publishers and books (CSV or JSONL)."""
+import csv
+import json
+import click
+from sqlalchemy import Integer, insert, select
+from sqlalchemy.exc import IntegrityError
+from models import Author, Publisher, Book, Session
+from crud import (validate_author, validate_publisher, validate_book, update_authors, update_publishers,
+                  update_books, upsert_publishers, upsert_books, persist)
+
+BATCH_SIZE = 10000
+
+MODELS = {
+    "author": Author,
+    "publisher": Publisher,
+    "book": Book
+}
+
+class ImportReport:
+    """Outcome of an import: number of inserted rows and (line, error) for every rejected row."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = []
+
+    def __repr__(self):
+        return f"ImportReport(inserted={self.inserted}, rejected={len(self.rejected)})"
+
+def _file_format(path):
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith(".jsonl") or path.endswith(".ndjson"):
+        return "jsonl"
+    raise ValueError("File must end in .csv or .jsonl.")
+
+def read_rows(path):
+    """Yield (line_number, row) pairs without loading the whole file.
+
+    CSV rows are dicts; JSONL rows are left as text and decoded during
+    validation so one malformed line is rejected instead of aborting the run.
+    """
+    file_format = _file_format(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_no, line
+
+def _as_dict(row):
+    if isinstance(row, str):
+        row = json.loads(row)
+        if not isinstance(row, dict):
+            raise ValueError("Each JSONL line must be an object.")
+    return row
+
+def _text(row, key):
+    value = row.get(key)
+    return str(value).strip() if value is not None else ""
+
+def _integer(row, key, label):
+    try:
+        return int(row.get(key))
+    except (TypeError, ValueError):
+        raise ValueError(f"{label} must be an integer.")
+
+class _References:
+    """Author/publisher lookups built once per import instead of per row."""
+
+    def __init__(self, session):
+        self.author_ids = set()
+        self.author_ids_by_name = {}
+        for id, first_name, last_name in session.execute(
+                select(Author.id, Author.first_name, Author.last_name).order_by(Author.id)):
+            self.author_ids.add(id)
+            self.author_ids_by_name.setdefault(f"{first_name} {last_name}", id)
+        self.publisher_ids = set()
+        self.publisher_ids_by_name = {}
+        for id, name in session.execute(select(Publisher.id, Publisher.name)):
+            self.publisher_ids.add(id)
+            self.publisher_ids_by_name[name] = id
+
+    def resolve(self, row, key, ids, ids_by_name, label):
+        """Map a row's <key>_id or <key>_name column to an existing id."""
+        if row.get(f"{key}_id") not in (None, ""):
+            id = _integer(row, f"{key}_id", f"{label} ID")
+            if id not in ids:
+                id = None
+        else:
+            id = ids_by_name.get(_text(row, f"{key}_name"))
+        if id is None:
+            raise ValueError(f"{label} not found.")
+        return id
+
+def _clean_author(row, refs):
+    values = {
+        "first_name": _text(row, "first_name"),
+        "last_name": _text(row, "last_name"),
+        "birth_year": _integer(row, "birth_year", "Birth year"),
+        "nationality": _text(row, "nationality")
+    }
+    validate_author(**values)
+    return values
+
+def _clean_publisher(row, refs):
+    values = {
+        "name": _text(row, "name"),
+        "founded_year": _integer(row, "founded_year", "Founded year"),
+        "location": _text(row, "location"),
+        "website": _text(row, "website") or None
+    }
+    validate_publisher(**values)
+    return values
+
+def _clean_book(row, refs):
+    values = {
+        "title": _text(row, "title"),
+        "publication_year": _integer(row, "publication_year", "Publication year"),
+        "genre": _text(row, "genre"),
+        "author_id": refs.resolve(row, "author", refs.author_ids, refs.author_ids_by_name, "Author"),
+        "publisher_id": refs.resolve(row, "publisher", refs.publisher_ids, refs.publisher_ids_by_name, "Publisher")
+    }
+    validate_book(**values)
+    return values
+
+# entity type -> (row cleaner, unique column, message for a duplicate)
+IMPORTERS = {
+    "author": (_clean_author, None, None),
+    "publisher": (_clean_publisher, "name", "Publisher name must be unique."),
+    "book": (_clean_book, "title", "Book title must be unique.")
+}
+REFERENCE_MESSAGE = "Author or publisher not found."  # a book whose author or publisher was deleted mid-import
+
+UPDATERS = {
+    "author": update_authors,
+    "publisher": update_publishers,
+    "book": update_books
+}
+
+# Entities with a unique key to upsert on
+UPSERTERS = {
+    "publisher": upsert_publishers,
+    "book": upsert_books
+}
+
+def _insert_batch(session, entity_type, batch, report, upsert=False):
+    """Insert a batch with one executemany, rejecting rows that break a unique key.
+
+    With upsert, rows whose key is taken update the existing row instead.
+    The insert is first tried without looking the keys up; only a batch the
+    database refuses pays for the lookup, then for inserting row by row.
+    """
+    if upsert:
+        report.inserted += UPSERTERS[entity_type](session, [values for _, values in batch])
+        return
+    model = MODELS[entity_type]
+    unique, message = IMPORTERS[entity_type][1:]
+    if unique:
+        batch = _drop_taken(batch, unique, message, set(), report)
+    try:
+        _insert_rows(session, model, batch)
+    except IntegrityError:
+        if unique:
+            column = getattr(model, unique)
+            taken = set(session.scalars(select(column).where(column.in_([v[unique] for _, v in batch]))))
+            batch = _drop_taken(batch, unique, message, taken, report)
+        try:
+            _insert_rows(session, model, batch)
+        except IntegrityError:
+            # Someone else wrote since the check above: find the rows that now clash, one at a time.
+            _insert_each(session, model, unique, message, batch, report)
+            return
+    report.inserted += len(batch)
+
+def _drop_taken(batch, unique, message, taken, report):
+    """Reject rows whose unique key is in taken or came earlier in the batch."""
+    accepted = []
+    for line_no, values in batch:
+        if values[unique] in taken:
+            report.rejected.append((line_no, message))
+        else:
+            taken.add(values[unique])
+            accepted.append((line_no, values))
+    return accepted
+
+def _insert_rows(session, model, batch):
+    # A Core insert into the table: the ORM's bulk insert spends as long again preparing the rows.
+    if batch:
+        persist(session, lambda: session.execute(insert(model.__table__), [values for _, values in batch]))
+
+def _insert_each(session, model, unique, message, batch, report):
+    """Insert rows one by one, each in a savepoint, rejecting those the database refuses."""
+    for line_no, values in batch:
+        try:
+            with session.begin_nested():
+                session.execute(insert(model), values)
+        except IntegrityError:
+            # A key taken meanwhile or, for books, an author or publisher deleted meanwhile.
+            column = getattr(model, unique) if unique else None
+            taken = column is not None and session.scalar(select(column).where(column == values[unique])) is not None
+            report.rejected.append((line_no, message if taken else REFERENCE_MESSAGE))
+            continue
+        report.inserted += 1
+    persist(session)
+
+def import_rows(session, entity_type, rows, batch_size=BATCH_SIZE, upsert=False):
+    """Validate and insert (line_number, row) pairs in batches of batch_size."""
+    if upsert and entity_type not in UPSERTERS:
+        raise ValueError(f"{entity_type.title()}s have no unique key to upsert on.")
+    clean = IMPORTERS[entity_type][0]
+    refs = _References(session) if entity_type == "book" else None
+    report = ImportReport()
+    batch = []
+    for line_no, row in rows:
+        try:
+            batch.append((line_no, clean(_as_dict(row), refs)))
+        except ValueError as e:
+            report.rejected.append((line_no, str(e)))
+            continue
+        if len(batch) >= batch_size:
+            _insert_batch(session, entity_type, batch, report, upsert)
+            batch = []
+    if batch:
+        _insert_batch(session, entity_type, batch, report, upsert)
+    report.rejected.sort()
+    return report
+
+def import_file(session, entity_type, path, batch_size=BATCH_SIZE, upsert=False):
+    return import_rows(session, entity_type, read_rows(path), batch_size, upsert)
+
+def _assignments(entity_type, pairs, option):
+    """Turn column=value pairs into a dict; a column given twice collects its values in a list."""
+    columns = MODELS[entity_type].__table__.columns
+    values = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep or key not in columns:
+            raise click.BadParameter(f"expected column=value with a {entity_type} column, got '{pair}'.",
+                                     param_hint=option)
+        if value == "" and columns[key].nullable:
+            value = None
+        elif isinstance(columns[key].type, Integer):
+            try:
+                value = int(value)
+            except ValueError:
+                raise click.BadParameter(f"{key} must be an integer.", param_hint=option)
+        if key in values:
+            previous = values[key]
+            values[key] = (previous if isinstance(previous, list) else [previous]) + [value]
+        else:
+            values[key] = value
+    return values
+
+def export_file(session, entity_type, path, batch_size=BATCH_SIZE):
+    """Stream every row of an entity table to a CSV/JSONL file and return the row count."""
+    file_format = _file_format(path)
+    model = MODELS[entity_type]
+    columns = [c.name for c in model.__table__.columns]
+    # Mapped attributes rather than table columns, so book_count is counted where no trigger keeps it.
+    result = session.execute(
+        select(*(getattr(model, c) for c in columns)).order_by(model.id).execution_options(yield_per=batch_size)
+    )
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in result:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in result:
+                f.write(json.dumps(dict(zip(columns, row))) + "\n")
+                count += 1
+    return count
+
+@click.group()
+def cli():
+    """Bulk import/export for the library database."""
+
+@cli.command("import")
+@click.argument("entity_type", type=click.Choice(list(MODELS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=BATCH_SIZE, show_default=True, help="Rows per INSERT batch and transaction.")
+@click.option("--upsert", is_flag=True, help="Update publishers/books whose name/title already exists instead of rejecting them.")
+@click.option("--workers", default=1, show_default=True,
+              help="Processes that parse and validate rows; 0 uses every CPU. One thread still does all the writing.")
+def import_command(entity_type, path, batch_size, upsert, workers):
+    """Import authors, publishers or books from a .csv or .jsonl file."""
+    session = Session()
+    try:
+        if workers == 1:
+            report = import_file(session, entity_type, path, batch_size, upsert)
+        else:
+            from ingest import ingest_file
+            report = ingest_file(session, entity_type, path, workers or None, batch_size, upsert,
+                                 progress=lambda r: click.echo(f"{r.inserted} inserted, {len(r.rejected)} rejected",
+                                                               err=True))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        session.close()
+    click.echo(f"Imported {report.inserted} {entity_type}s, rejected {len(report.rejected)}.")
+    for line_no, error in report.rejected:
+        click.echo(f"Line {line_no}: {error}")
+    if workers != 1:
+        click.echo(report.format_timings(), err=True)
+
+@cli.command("update")
+@click.argument("entity_type", type=click.Choice(list(MODELS)))
+@click.option("--where", "where", multiple=True, required=True, metavar="COLUMN=VALUE",
+              help="Rows to change; repeat a column to match any of several values.")
+@click.option("--set", "assignments", multiple=True, required=True, metavar="COLUMN=VALUE", help="New column value.")
+def update_command(entity_type, where, assignments):
+    """Change every matching author, publisher or book with one UPDATE."""
+    criteria = _assignments(entity_type, where, "--where")
+    values = _assignments(entity_type, assignments, "--set")
+    if any(isinstance(value, list) for value in values.values()):
+        raise click.BadParameter("each column can be set only once.", param_hint="--set")
+    session = Session()
+    try:
+        count = UPDATERS[entity_type](session, values, **criteria)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        session.close()
+    click.echo(f"Updated {count} {entity_type}s.")
+
+@cli.command("export")
+@click.argument("entity_type", type=click.Choice(list(MODELS)))
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+def export_command(entity_type, path):
+    """Export authors, publishers or books to a .csv or .jsonl file."""
+    session = Session()
+    try:
+        count = export_file(session, entity_type, path)
+    finally:
+        session.close()
+    click.echo(f"Exported {count} {entity_type}s to {path}.")
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,209 @@
+"""Bounded LRU cache for single-entity lookups, invalidated by session events.
+
+Rows are cached as plain column snapshots and handed back through
+session.merge(load=False), so a hit costs no SQL. An object already in the
+session's identity map is returned as it is, unsaved changes included, and the
+snapshot is not used. Name lookups cache only the id.
+
+Only SQLite databases are cached: other connections' commits are noticed
+through SQLite's PRAGMA data_version, which server databases have no
+equivalent of, so there every lookup goes to load(). The cache may be shared
+by several threads.
+
+A row is only stored if nothing was invalidated since the session's
+transaction began: a reader on an older snapshot must not put back a row
+another session has just changed. Rows a session wrote are invalidated again
+when it commits, as reads between its flush and its commit still saw the old
+values, and the committing connection itself never sees data_version move.
+"""
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as BaseSession, make_transient_to_detached, object_mapper
+from models import Author, Publisher, Book
+
+CACHE_SIZE = 4096
+MISSING = object()
+GENERATION = "lookup_cache_generation"  # session.info key: generation when the transaction began
+PENDING = "lookup_cache_pending"  # session.info key: invalidations to repeat at commit
+
+class EntityCache:
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()  # (engine, model, id) -> column dict, or None if no such row
+        self._names = OrderedDict()  # (engine, model, name) -> id, or None if no such row
+        self._lock = threading.RLock()  # guards the dicts and counters
+        self.generation = 0  # bumped by every invalidation
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._rows) + len(self._names),
+                    "maxsize": self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._rows.clear()
+            self._names.clear()
+
+    def _lookup(self, session, entries, key):
+        # Make sure the session's transaction has begun, so _check_other_writers
+        # has had its chance to drop entries made stale by other connections.
+        session.connection()
+        with self._lock:
+            value = entries.get(key, MISSING)
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                entries.move_to_end(key)
+            return value
+
+    def _store(self, session, entries, key, value):
+        with self._lock:
+            if session.info.get(GENERATION) != self.generation:
+                return  # the row may have changed since this transaction's snapshot
+            entries[key] = value
+            entries.move_to_end(key)
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+
+    def _remember(self, session, model, entity):
+        if entity is not None:
+            mapper = object_mapper(entity)
+            snapshot = {attr.key: getattr(entity, attr.key) for attr in mapper.column_attrs}
+            self._store(session, self._rows, (_engine(session), model, entity.id), snapshot)
+
+    def get(self, session, model, id, load):
+        """Return the model row with this id, calling load() only on a miss."""
+        engine = _engine(session)
+        if engine.dialect.name != "sqlite":
+            return load()
+        loaded = session.identity_map.get(BaseSession.identity_key(model, id))
+        if loaded is not None and loaded not in session.deleted:
+            return loaded
+        key = (engine, model, id)
+        snapshot = self._lookup(session, self._rows, key)
+        if snapshot is MISSING:
+            entity = load()
+            if entity is None:
+                self._store(session, self._rows, key, None)
+            else:
+                self._remember(session, model, entity)
+            return entity
+        if snapshot is None:
+            return None
+        instance = model(**snapshot)
+        make_transient_to_detached(instance)
+        return session.merge(instance, load=False)
+
+    def get_by_name(self, session, model, name, load):
+        """Return the model row found by load() for this name, reusing the cached id."""
+        engine = _engine(session)
+        if engine.dialect.name != "sqlite":
+            return load()
+        key = (engine, model, name)
+        id = self._lookup(session, self._names, key)
+        if id is MISSING:
+            entity = load()
+            self._store(session, self._names, key, entity.id if entity is not None else None)
+            self._remember(session, model, entity)
+            return entity
+        if id is None:
+            return None
+        return self.get(session, model, id, load)
+
+    def note_data_version(self, connection_info, version):
+        """Clear the cache unless this connection has seen no outside commits since last time."""
+        if connection_info.get("lookup_cache_data_version") != version:
+            self.clear()
+        connection_info["lookup_cache_data_version"] = version
+
+    def invalidate(self, engine, model, ids=None):
+        """Forget the given rows (every row of model when ids is None) and all name lookups for model."""
+        with self._lock:
+            self.generation += 1
+            if ids is None:
+                for key in [k for k in self._rows if k[0] is engine and k[1] is model]:
+                    del self._rows[key]
+            else:
+                for id in ids:
+                    self._rows.pop((engine, model, id), None)
+            for key in [k for k in self._names if k[0] is engine and k[1] is model]:
+                del self._names[key]
+
+def _engine(session):
+    bind = session.get_bind()
+    return getattr(bind, "engine", bind)
+
+LOOKUP_CACHE = EntityCache()
+
+def _invalidate(session, engine, model, ids=None):
+    LOOKUP_CACHE.invalidate(engine, model, ids)
+    session.info.setdefault(PENDING, []).append((engine, model, ids))
+
+@event.listens_for(BaseSession, "after_flush")
+def _invalidate_flushed(session, flush_context):
+    changed = {}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        changed.setdefault(type(obj), []).append(obj.id)
+        if isinstance(obj, Book):
+            # Triggers moved the book_count of its author and publisher, old and new.
+            for model, column in ((Author, "author_id"), (Publisher, "publisher_id")):
+                history = inspect(obj).attrs[column].history
+                changed.setdefault(model, []).extend(history.deleted or [])
+                changed[model].append(getattr(obj, column))
+    engine = _engine(session)
+    for model, ids in changed.items():
+        _invalidate(session, engine, model, ids)
+    if any(isinstance(obj, (Author, Publisher)) for obj in session.deleted):
+        # Their books went too, through a database cascade we never see, and
+        # took the book counts of the other side with them.
+        for model in (Book, Author, Publisher):
+            _invalidate(session, engine, model)
+
+TABLE_MODELS = {model.__table__: model for model in (Author, Publisher, Book)}
+
+@event.listens_for(BaseSession, "do_orm_execute")
+def _invalidate_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        session = orm_execute_state.session
+        engine = _engine(session)
+        written = [mapper.class_ for mapper in orm_execute_state.all_mappers]
+        if not written:
+            # A Core statement on the table itself, e.g. insert(Book.__table__).
+            table = getattr(orm_execute_state.statement, "table", None)
+            written = [TABLE_MODELS[table]] if table in TABLE_MODELS else []
+        for model in written:
+            _invalidate(session, engine, model)
+            if model in (Author, Publisher) and orm_execute_state.is_delete:
+                for related in (Book, Author, Publisher):
+                    _invalidate(session, engine, related)
+            elif model is Book:
+                # The book_count triggers changed authors and publishers too.
+                _invalidate(session, engine, Author)
+                _invalidate(session, engine, Publisher)
+
+@event.listens_for(BaseSession, "after_soft_rollback")
+def _clear_on_rollback(session, previous_transaction):
+    # Rows read or invalidated inside the rolled-back transaction may not
+    # match the database any more.
+    session.info.pop(PENDING, None)
+    LOOKUP_CACHE.clear()
+
+@event.listens_for(BaseSession, "after_commit")
+def _invalidate_committed(session):
+    # Another session may have cached the old rows between our flush and now.
+    for engine, model, ids in session.info.pop(PENDING, ()):
+        LOOKUP_CACHE.invalidate(engine, model, ids)
+
+@event.listens_for(BaseSession, "after_begin")
+def _check_other_writers(session, transaction, connection):
+    # SQLite bumps data_version whenever another connection commits, which
+    # covers other processes writing the same file.
+    if connection.dialect.name == "sqlite":
+        version = connection.exec_driver_sql("PRAGMA data_version").scalar()
+        LOOKUP_CACHE.note_data_version(connection.info, version)
+        session.info[GENERATION] = LOOKUP_CACHE.generation
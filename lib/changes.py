@@ -0,0 +1,76 @@
+"""Incremental sync from the change_log: read changes since a sequence number, and compact the log.
+
+Triggers append one change_log row per insert, update or delete of an
+author, publisher or book, with a seq that only ever grows. A consumer
+remembers the last seq it applied and asks for the changes after it, which
+costs O(changes) however large the catalog is. Changes carry the row as it
+is now, not as it was at that seq, so consumers should treat inserts and
+updates alike as upserts keyed on (entity, id).
+
+Compaction deletes entries superseded by a later change to the same row.
+A consumer at any seq still ends up with the same state, because the latest
+change to every row is kept, deletes included.
+"""
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import aliased
+from models import Author, Publisher, Book, Change
+
+CHANGE_BATCH_SIZE = 1000
+
+MODELS = {
+    "author": Author,
+    "publisher": Publisher,
+    "book": Book
+}
+
+def latest_seq(session):
+    """seq of the newest change, or 0 if the log is empty."""
+    return session.scalar(select(func.max(Change.seq))) or 0
+
+def get_changes_page(session, since=0, page_size=CHANGE_BATCH_SIZE):
+    """Up to page_size changes with seq greater than since, in seq order."""
+    return session.scalars(select(Change).where(Change.seq > since).order_by(Change.seq).limit(page_size)).all()
+
+def _current_rows(session, changes):
+    """(entity, id) -> column dict for the rows the changes refer to that still exist."""
+    ids = {}
+    for change in changes:
+        ids.setdefault(change.entity, set()).add(change.entity_id)
+    rows = {}
+    for entity, entity_ids in ids.items():
+        table = MODELS[entity].__table__
+        for row in session.execute(select(table).where(table.c.id.in_(entity_ids))).mappings():
+            rows[entity, row["id"]] = dict(row)
+    return rows
+
+def iter_changes(session, since=0, page_size=CHANGE_BATCH_SIZE):
+    """Yield every change after since as a dict: seq, entity, id, operation and row.
+
+    row holds the current column values, or None once the row is deleted.
+    Changes are fetched page_size at a time, with one query per entity for
+    their rows.
+    """
+    while True:
+        page = get_changes_page(session, since, page_size)
+        if not page:
+            return
+        rows = _current_rows(session, page)
+        for change in page:
+            yield {"seq": change.seq, "entity": change.entity, "id": change.entity_id,
+                   "operation": change.operation, "row": rows.get((change.entity, change.entity_id))}
+        since = page[-1].seq
+
+def compact_changes(session, through=None):
+    """Delete changes up to seq through (default: all) that a later change to the same row supersedes.
+
+    Returns the number of changes deleted.
+    """
+    later = aliased(Change)
+    superseded = select(later.seq).where(later.entity == Change.entity, later.entity_id == Change.entity_id,
+                                         later.seq > Change.seq).exists()
+    statement = delete(Change).where(superseded)
+    if through is not None:
+        statement = statement.where(Change.seq <= through)
+    result = session.execute(statement)
+    session.commit()
+    return result.rowcount
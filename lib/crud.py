@@ -1,35 +1,344 @@
-from sqlalchemy.exc import IntegrityError
-from models import Author, Publisher, Book
+import difflib
+import inspect
+import random
+import re
+import time
+from contextlib import contextmanager
+from sqlalchemy import Integer, select, text, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import ObjectDeletedError, StaleDataError
+from models import Author, Publisher, Book, WRITE_LOCK
+from cache import LOOKUP_CACHE
 
-def create_author(session, first_name, last_name, birth_year, nationality):
+PAGE_SIZE = 50
+SEARCH_LIMIT = 20
+SEARCH_CANDIDATES = 200  # matches ranked per pass of _search_ids
+SEARCH_COLUMNS = {"authors_fts": ("first_name", "last_name"), "books_fts": ("title", "genre")}
+UPSERT_BATCH_SIZE = 1000  # rows per INSERT ... ON CONFLICT, well under SQLite's bound parameter limit
+UNIT_OF_WORK = "unit_of_work"  # session.info key: None, or whether each write gets a SAVEPOINT
+LOCK_RETRIES = 8  # further attempts when SQLite reports "database is locked"
+LOCK_BACKOFF = 0.01  # seconds; the longest wait before retry n is LOCK_BACKOFF * 2 ** n
+READ_ONLY_COLUMNS = {"id", "book_count", "version_id"}  # never set by update_*
+STALE_MESSAGE = "Someone else changed or deleted this record since it was loaded. Reload it and try again."
+
+@contextmanager
+def unit_of_work(session, savepoints=False):
+    """Run several crud writes in one transaction, committed when the block exits.
+
+    Inside the block create_*/delete_* only flush, and a write that fails,
+    e.g. with a duplicate title, leaves the whole unit to be rolled back.
+    With savepoints=True each write runs in its own SAVEPOINT instead, so a
+    failed write is undone on its own and the caller can carry on, but the
+    bookkeeping makes that about as slow as committing every write (see
+    benchmarks/bench_unit_of_work.py). An exception escaping the block rolls
+    everything back. Nested blocks join the outermost one.
+    """
+    if session.info.get(UNIT_OF_WORK) is not None:
+        yield session
+        return
+    session.info[UNIT_OF_WORK] = savepoints
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.info[UNIT_OF_WORK] = None
+
+def persist(session, change=None):
+    """Apply change() (if given) and save it: commit normally, flush inside a unit of work.
+
+    Outside a unit of work, a commit that fails because SQLite reports the
+    database is locked is rolled back and retried, change() included, after
+    a random exponential backoff and holding the write lock from the start;
+    without a change() it is not retried, as the rollback has discarded what
+    there was to save. Writing a row that someone else changed or deleted
+    since it was loaded (its version_id no longer matches) raises
+    ValueError(STALE_MESSAGE), on the first try or a retry alike.
+    """
+    savepoints = session.info.get(UNIT_OF_WORK)
+    try:
+        if savepoints is None:
+            _commit(session, change)
+        elif savepoints:
+            with session.begin_nested():
+                if change:
+                    change()
+        else:
+            if change:
+                change()
+            session.flush()
+    except (StaleDataError, ObjectDeletedError):
+        if savepoints is None:
+            session.rollback()
+        raise ValueError(STALE_MESSAGE)
+
+def _is_locked(error):
+    return "database is locked" in str(error.orig)
+
+def _commit(session, change):
+    versions = {}  # version_id each changed row had on the first attempt
+    for attempt in range(LOCK_RETRIES + 1):
+        added = []
+        try:
+            if attempt:
+                # Lock first this time, so the rows change() reads cannot go stale before it writes.
+                session.connection(execution_options={WRITE_LOCK: True})
+            if change:
+                change()
+            added = list(session.new)
+            changed = [obj for obj in list(session.dirty) + list(session.deleted)
+                       if isinstance(obj, (Author, Publisher, Book))]
+            with session.no_autoflush:  # read the versions in the database, not ones our own UPDATE bumped
+                current = {obj: obj.version_id for obj in changed}
+            if not attempt:
+                versions = current
+            elif any(version != versions.get(obj, version) for obj, version in current.items()):
+                # The rollback reloaded rows someone else wrote meanwhile; saving now would overwrite them.
+                raise StaleDataError(STALE_MESSAGE)
+            session.commit()
+            return
+        except IntegrityError:
+            session.rollback()
+            raise
+        except OperationalError as e:
+            session.rollback()
+            if change is None or attempt == LOCK_RETRIES or not _is_locked(e):
+                raise
+            for obj in added:
+                obj.id = None  # a rolled-back INSERT leaves its id behind; let the retry get a fresh one
+            time.sleep(random.uniform(0, LOCK_BACKOFF * 2 ** attempt))
+
+def check_version(entity, version_id):
+    """Raise ValueError(STALE_MESSAGE) unless entity's row is still at version_id.
+
+    Call it from the change() given to persist, so a retry checks the row as
+    it is by then rather than the copy loaded before.
+    """
+    try:
+        current = entity.version_id
+    except ObjectDeletedError:
+        current = None
+    if current != version_id:
+        raise ValueError(STALE_MESSAGE)
+
+def _get_page(query, model, after_id=0, page_size=PAGE_SIZE):
+    """Return up to page_size rows with id greater than after_id, in id order."""
+    return query.filter(model.id > after_id).order_by(model.id).limit(page_size).all()
+
+def _iter_pages(get_page, session, page_size):
+    """Yield rows one at a time, fetching them page by page on the id keyset."""
+    after_id = 0
+    while True:
+        page = get_page(session, after_id, page_size)
+        if not page:
+            return
+        yield from page
+        after_id = page[-1].id
+
+def _search_terms(query):
+    return re.findall(r"[^\W_]+", query.lower())
+
+def _close_terms(session, fts_table, term):
+    """Indexed terms that look like a misspelling of term (same first two letters)."""
+    candidates = session.execute(
+        text(f"SELECT term FROM {fts_table}_vocab WHERE term >= :low AND term < :high"),
+        {"low": term[:2], "high": term[:2] + "\uffff"}
+    ).scalars().all()
+    return difflib.get_close_matches(term, candidates, n=3, cutoff=0.75)
+
+def _match_expression(terms, alternatives, prefix=True):
+    parts = []
+    for term in terms:
+        options = [f'"{term}"*' if prefix else f'"{term}"'] + [f'"{alt}"' for alt in alternatives.get(term, []) if alt != term]
+        parts.append(options[0] if len(options) == 1 else f"({' OR '.join(options)})")
+    return " AND ".join(parts)
+
+def _ranked_ids(session, fts_table, terms, alternatives, limit):
+    size = " + ".join(f"length({column})" for column in SEARCH_COLUMNS[fts_table])
+    sql = text(f"SELECT rowid FROM (SELECT rowid, {size} AS size FROM {fts_table} WHERE {fts_table} MATCH :match "
+               f"LIMIT :candidates) ORDER BY size, rowid LIMIT :limit")
+    ids = []
+    for prefix in (False, True):
+        params = {"match": _match_expression(terms, alternatives, prefix), "candidates": SEARCH_CANDIDATES,
+                  "limit": limit}
+        ids += [id for id in session.execute(sql, params).scalars() if id not in ids]
+        if len(ids) >= limit:
+            break
+    return ids[:limit]
+
+def _search_ids(session, fts_table, query, limit):
+    """Ids of the closest matches for every term, whole words before prefixes, retried with spelling alternatives.
+
+    Matches are ranked shortest first, which is the order bm25 gives when
+    every term occurs once, without bm25's pass over each term's whole
+    posting list. Each pass ranks only the first SEARCH_CANDIDATES matches in
+    id order, so a broad query costs no more than a narrow one, but it can
+    miss a closer match further along. Whole-word matches come first; the
+    prefix pass runs only when there are fewer than limit of them.
+    """
+    terms = _search_terms(query)
+    if not terms:
+        return []
+    ids = _ranked_ids(session, fts_table, terms, {}, limit)
+    if not ids:
+        alternatives = {term: _close_terms(session, fts_table, term) for term in terms}
+        if any(alternatives.values()):
+            ids = _ranked_ids(session, fts_table, terms, alternatives, limit)
+    return ids
+
+def _in_rank_order(query, model, ids):
+    rows = {row.id: row for row in query.filter(model.id.in_(ids))}
+    return [rows[id] for id in ids if id in rows]
+
+def _validate_changes(validate, model, values):
+    """Run validate on the columns being changed by a set-based update.
+
+    Columns left alone get a stand-in (1 or "-") that every validate_* rule
+    accepts, so only the new values can fail.
+    """
+    columns = model.__table__.columns
+    for key in values:
+        if key in READ_ONLY_COLUMNS or key not in columns:
+            raise ValueError(f"Unknown field '{key}'.")
+    if not values:
+        raise ValueError("Nothing to update.")
+    arguments = {}
+    for name in inspect.signature(validate).parameters:
+        stand_in = 1 if isinstance(columns[name].type, Integer) else "-"
+        arguments[name] = values.get(name, stand_in)
+    validate(**arguments)
+
+def _filter(model, criteria):
+    """WHERE clauses for column=value criteria; a list, tuple or set value matches any of its items."""
+    if not criteria:
+        raise ValueError("At least one filter is required.")
+    clauses = []
+    for key, value in criteria.items():
+        if key not in model.__table__.columns:
+            raise ValueError(f"Unknown field '{key}'.")
+        column = getattr(model, key)
+        clauses.append(column.in_(value) if isinstance(value, (list, tuple, set)) else column == value)
+    return clauses
+
+def _bump_version(model, values):
+    """values plus the version_id increment every UPDATE carries, so copies loaded before it go stale."""
+    return {**values, "version_id": model.version_id + 1}
+
+def _update_where(session, model, values, criteria, unique_message=None):
+    """Apply values to every row matching criteria in one UPDATE and return the number of rows matched."""
+    statement = update(model).where(*_filter(model, criteria)).values(_bump_version(model, values))
+    result = []
+    try:
+        persist(session, lambda: result.append(session.execute(statement)))
+    except IntegrityError:
+        if unique_message:
+            raise ValueError(unique_message)
+        raise
+    return result[-1].rowcount  # the last attempt: persist may retry a locked database
+
+def _upsert_rows(validate, rows):
+    """Validate each row (a dict of the create_* fields) and return them with only those fields."""
+    names = list(inspect.signature(validate).parameters)
+    cleaned = []
+    for row in rows:
+        values = {name: row.get(name) for name in names}
+        validate(**values)
+        cleaned.append(values)
+    return cleaned
+
+def _upsert_statement(session, model, key, columns):
+    """INSERT that, for a row already holding the same key, updates the given columns instead."""
+    dialect = session.get_bind().dialect.name
+    columns = [name for name in columns if name != key]
+    if dialect == "mysql":
+        statement = mysql.insert(model)
+        updates = {name: statement.inserted[name] for name in columns}
+        return statement.on_duplicate_key_update(_bump_version(model, updates))
+    if dialect not in ("sqlite", "postgresql"):
+        raise ValueError(f"Upserts are not supported on {dialect}.")
+    statement = (sqlite if dialect == "sqlite" else postgresql).insert(model)
+    updates = {name: statement.excluded[name] for name in columns}
+    return statement.on_conflict_do_update(index_elements=[key], set_=_bump_version(model, updates))
+
+def _upsert(session, model, key, rows, batch_size=UPSERT_BATCH_SIZE):
+    """Insert or update rows (dicts, already validated) keyed on the unique column key.
+
+    Later rows win over earlier ones with the same key. Returns the number of
+    distinct keys written.
+    """
+    rows = list({row[key]: row for row in rows}.values())
+    if not rows:
+        return 0
+    statement = _upsert_statement(session, model, key, rows[0])
+
+    def write():
+        for start in range(0, len(rows), batch_size):
+            session.execute(statement, rows[start:start + batch_size])
+
+    persist(session, write)
+    return len(rows)
+
+def _missing_ids(session, model, ids):
+    ids = set(ids)
+    found = set()
+    ordered = sorted(ids)
+    for start in range(0, len(ordered), UPSERT_BATCH_SIZE):
+        found.update(session.scalars(select(model.id).where(model.id.in_(ordered[start:start + UPSERT_BATCH_SIZE]))))
+    return ids - found
+
+def _check_references(session, rows):
+    """Raise ValueError if any book row names an author or publisher that does not exist."""
+    if _missing_ids(session, Author, [row["author_id"] for row in rows if "author_id" in row]):
+        raise ValueError("Author not found.")
+    if _missing_ids(session, Publisher, [row["publisher_id"] for row in rows if "publisher_id" in row]):
+        raise ValueError("Publisher not found.")
+
+def validate_author(first_name, last_name, birth_year, nationality):
     if birth_year < 0:
         raise ValueError("Birth year must be positive.")
     if not all([first_name, last_name, nationality]):
         raise ValueError("All fields are required.")
+
+def create_author(session, first_name, last_name, birth_year, nationality):
+    validate_author(first_name, last_name, birth_year, nationality)
     author = Author(first_name=first_name, last_name=last_name, birth_year=birth_year, nationality=nationality)
-    session.add(author)
-    session.commit()
+    persist(session, lambda: session.add(author))
     return author
 
 def delete_author(session, id):
     author = find_author_by_id(session, id)
     if author:
-        session.delete(author)
-        session.commit()
+        persist(session, lambda: session.delete(author))
         return True
     return False
 
 def get_all_authors(session):
     return session.query(Author).all()
 
+def get_authors_page(session, after_id=0, page_size=PAGE_SIZE):
+    return _get_page(session.query(Author), Author, after_id, page_size)
+
+def iter_authors(session, page_size=PAGE_SIZE):
+    yield from _iter_pages(get_authors_page, session, page_size)
+
 def find_author_by_id(session, id):
-    return session.query(Author).filter_by(id=id).first()
+    return LOOKUP_CACHE.get(session, Author, id, lambda: session.query(Author).filter_by(id=id).first())
 
 def find_author_by_name(session, full_name):
     parts = full_name.split()
     first_name = parts[0]
     last_name = ' '.join(parts[1:]) if len(parts) > 1 else ''
-    return session.query(Author).filter_by(first_name=first_name, last_name=last_name).first()
+    return LOOKUP_CACHE.get_by_name(
+        session, Author, (first_name, last_name),
+        lambda: session.query(Author).filter_by(first_name=first_name, last_name=last_name).first()
+    )
+
+def search_authors(session, query, limit=SEARCH_LIMIT):
+    return _in_rank_order(session.query(Author), Author, _search_ids(session, "authors_fts", query, limit))
 
 def get_books_by_author(session, author_id):
     author = find_author_by_id(session, author_id)
@@ -37,36 +346,59 @@ def get_books_by_author(session, author_id):
         return author.books
     return []
 
-def create_publisher(session, name, founded_year, location, website):
+def get_books_by_author_page(session, author_id, after_id=0, page_size=PAGE_SIZE):
+    """One page of an author's books, with author and publisher loaded, without loading the rest."""
+    query = _books_with_relations(session).filter(Book.author_id == author_id)
+    return _get_page(query, Book, after_id, page_size)
+
+def iter_books_by_author(session, author_id, page_size=PAGE_SIZE):
+    def get_page(session, after_id, page_size):
+        return get_books_by_author_page(session, author_id, after_id, page_size)
+    yield from _iter_pages(get_page, session, page_size)
+
+def update_authors(session, values, **criteria):
+    """Set values on every author matching criteria in one UPDATE, e.g.
+    update_authors(session, {"nationality": "Kenyan"}, nationality="kenyan").
+    """
+    _validate_changes(validate_author, Author, values)
+    return _update_where(session, Author, values, criteria)
+
+def validate_publisher(name, founded_year, location, website):
     if founded_year < 0:
         raise ValueError("Founded year must be positive.")
     if not all([name, location]):
         raise ValueError("Name and location are required.")
+
+def create_publisher(session, name, founded_year, location, website):
+    validate_publisher(name, founded_year, location, website)
     publisher = Publisher(name=name, founded_year=founded_year, location=location, website=website)
     try:
-        session.add(publisher)
-        session.commit()
+        persist(session, lambda: session.add(publisher))
         return publisher
     except IntegrityError:
-        session.rollback()
         raise ValueError("Publisher name must be unique.")
 
 def delete_publisher(session, id):
     publisher = find_publisher_by_id(session, id)
     if publisher:
-        session.delete(publisher)
-        session.commit()
+        persist(session, lambda: session.delete(publisher))
         return True
     return False
 
 def get_all_publishers(session):
     return session.query(Publisher).all()
 
+def get_publishers_page(session, after_id=0, page_size=PAGE_SIZE):
+    return _get_page(session.query(Publisher), Publisher, after_id, page_size)
+
+def iter_publishers(session, page_size=PAGE_SIZE):
+    yield from _iter_pages(get_publishers_page, session, page_size)
+
 def find_publisher_by_id(session, id):
-    return session.query(Publisher).filter_by(id=id).first()
+    return LOOKUP_CACHE.get(session, Publisher, id, lambda: session.query(Publisher).filter_by(id=id).first())
 
 def find_publisher_by_name(session, name):
-    return session.query(Publisher).filter_by(name=name).first()
+    return LOOKUP_CACHE.get_by_name(session, Publisher, name, lambda: session.query(Publisher).filter_by(name=name).first())
 
 def get_books_by_publisher(session, publisher_id):
     publisher = find_publisher_by_id(session, publisher_id)
@@ -74,43 +406,98 @@ def get_books_by_publisher(session, publisher_id):
         return publisher.books
     return []
 
-def create_book(session, title, publication_year, genre, author_id, publisher_id):
+def get_books_by_publisher_page(session, publisher_id, after_id=0, page_size=PAGE_SIZE):
+    """One page of a publisher's books, with author and publisher loaded, without loading the rest."""
+    query = _books_with_relations(session).filter(Book.publisher_id == publisher_id)
+    return _get_page(query, Book, after_id, page_size)
+
+def iter_books_by_publisher(session, publisher_id, page_size=PAGE_SIZE):
+    def get_page(session, after_id, page_size):
+        return get_books_by_publisher_page(session, publisher_id, after_id, page_size)
+    yield from _iter_pages(get_page, session, page_size)
+
+def update_publishers(session, values, **criteria):
+    """Set values on every publisher matching criteria in one UPDATE."""
+    _validate_changes(validate_publisher, Publisher, values)
+    return _update_where(session, Publisher, values, criteria, "Publisher name must be unique.")
+
+def upsert_publishers(session, rows):
+    """Insert publishers (dicts of create_publisher's fields), updating the one already using a name."""
+    return _upsert(session, Publisher, "name", _upsert_rows(validate_publisher, rows))
+
+def validate_book(title, publication_year, genre, author_id, publisher_id):
     if publication_year < 0:
         raise ValueError("Publication year must be positive.")
     if not all([title, genre, author_id, publisher_id]):
         raise ValueError("All fields are required.")
+
+def create_book(session, title, publication_year, genre, author_id, publisher_id):
+    validate_book(title, publication_year, genre, author_id, publisher_id)
     if not find_author_by_id(session, author_id):
         raise ValueError("Author not found.")
     if not find_publisher_by_id(session, publisher_id):
         raise ValueError("Publisher not found.")
     book = Book(title=title, publication_year=publication_year, genre=genre, author_id=author_id, publisher_id=publisher_id)
     try:
-        session.add(book)
-        session.commit()
+        persist(session, lambda: session.add(book))
         return book
     except IntegrityError:
-        session.rollback()
         raise ValueError("Book title must be unique.")
 
 def delete_book(session, id):
     book = find_book_by_id(session, id)
     if book:
-        session.delete(book)
-        session.commit()
+        persist(session, lambda: session.delete(book))
         return True
     return False
 
+def update_books(session, values, **criteria):
+    """Set values on every book matching criteria in one UPDATE, e.g.
+    update_books(session, {"genre": "Science Fiction"}, genre=["Sci-Fi", "SF"]).
+    """
+    _validate_changes(validate_book, Book, values)
+    _check_references(session, [values])
+    return _update_where(session, Book, values, criteria, "Book title must be unique.")
+
+def upsert_books(session, rows):
+    """Insert books (dicts of create_book's fields), updating the one already using a title."""
+    rows = _upsert_rows(validate_book, rows)
+    _check_references(session, rows)
+    return _upsert(session, Book, "title", rows)
+
 def get_all_books(session):
     return session.query(Book).all()
 
 def find_book_by_id(session, id):
-    return session.query(Book).filter_by(id=id).first()
+    return LOOKUP_CACHE.get(session, Book, id, lambda: session.query(Book).filter_by(id=id).first())
 
 def find_book_by_title(session, title):
-    return session.query(Book).filter_by(title=title).first()
+    return LOOKUP_CACHE.get_by_name(session, Book, title, lambda: session.query(Book).filter_by(title=title).first())
+
+def _books_with_relations(session):
+    """Book query that loads author and publisher in the same SELECT."""
+    return session.query(Book).options(joinedload(Book.author), joinedload(Book.publisher))
+
+def get_all_books_with_relations(session):
+    return _books_with_relations(session).order_by(Book.id).all()
+
+def get_books_page(session, after_id=0, page_size=PAGE_SIZE):
+    return _get_page(_books_with_relations(session), Book, after_id, page_size)
+
+def iter_books(session, page_size=PAGE_SIZE):
+    yield from _iter_pages(get_books_page, session, page_size)
+
+def find_book_with_relations_by_id(session, id):
+    return _books_with_relations(session).filter(Book.id == id).first()
+
+def find_book_with_relations_by_title(session, title):
+    return _books_with_relations(session).filter(Book.title == title).first()
+
+def search_books(session, query, limit=SEARCH_LIMIT):
+    return _in_rank_order(_books_with_relations(session), Book, _search_ids(session, "books_fts", query, limit))
 
 def get_book_relations(session, book_id):
-    book = find_book_by_id(session, book_id)
+    book = find_book_with_relations_by_id(session, book_id)
     if book:
         return book.author, book.publisher
     return None, None
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Parallel import: shards are cleaned in worker processes and written by one writer thread.
+
+The main process reads the file and hands shards of batch_size rows to a
+ProcessPoolExecutor, where they are decoded and validated (and, for books,
+author/publisher names resolved against a map built once up front and
+copied to every worker). Cleaned shards go, in file order, through a
+bounded queue to a single writer thread that owns the only database
+session, so SQLite never sees two writers. When the writer falls behind the
+queue fills up and the reader waits, which keeps memory bounded.
+
+Only the cleaning runs in parallel, so this beats bulk.import_rows only when
+cleaning, not writing, is the bottleneck: with the full-text, report, count
+and change log triggers most of an import is the writer's, and on a machine
+without spare cores the worker processes only add overhead.
+"""
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from bulk import BATCH_SIZE, IMPORTERS, UPSERTERS, ImportReport, _References, _as_dict, _insert_batch, read_rows
+
+QUEUE_SIZE = 4  # cleaned shards waiting for the writer
+IN_FLIGHT_PER_WORKER = 2  # shards submitted to the pool per worker before the reader waits
+# Workers start from a fresh interpreter: forking this process would copy the
+# writer thread's locks and the session's open connection in whatever state they are.
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+class IngestReport(ImportReport):
+    """ImportReport plus the seconds spent in each stage."""
+
+    def __init__(self):
+        super().__init__()
+        self.timings = {"read": 0.0, "clean": 0.0, "waiting": 0.0, "write": 0.0, "total": 0.0}
+
+    def format_timings(self):
+        rows = self.inserted + len(self.rejected)
+        rate = rows / self.timings["total"] if self.timings["total"] else 0
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.timings.items())
+        # clean is summed over the workers, so it can exceed total.
+        return f"{rows} rows in {self.timings['total']:.2f}s ({rate:.0f} rows/s): {stages}"
+
+_worker = {}
+
+def _init_worker(entity_type, refs):
+    _worker["clean"] = IMPORTERS[entity_type][0]
+    _worker["refs"] = refs
+
+def _clean_shard(shard):
+    """Clean one shard in a worker: return (cleaned rows, rejected rows, seconds taken)."""
+    start = time.perf_counter()
+    clean, refs = _worker["clean"], _worker["refs"]
+    batch = []
+    rejected = []
+    for line_no, row in shard:
+        try:
+            batch.append((line_no, clean(_as_dict(row), refs)))
+        except ValueError as e:
+            rejected.append((line_no, str(e)))
+    return batch, rejected, time.perf_counter() - start
+
+class _Writer(threading.Thread):
+    """Drains the queue into the database; after an error it keeps draining so the reader never blocks."""
+
+    def __init__(self, session, entity_type, report, upsert, progress, queue_size):
+        super().__init__(name="ingest-writer", daemon=True)
+        self.session = session
+        self.entity_type = entity_type
+        self.report = report
+        self.upsert = upsert
+        self.progress = progress
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+
+    def run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            if self.error is not None or not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                _insert_batch(self.session, self.entity_type, batch, self.report, self.upsert)
+            except BaseException as e:
+                self.error = e
+                continue
+            self.report.timings["write"] += time.perf_counter() - start
+            if self.progress:
+                self.progress(self.report)
+
+def ingest_rows(session, entity_type, rows, workers=None, batch_size=BATCH_SIZE, upsert=False,
+                progress=None, queue_size=QUEUE_SIZE):
+    """Clean (line_number, row) pairs in worker processes and insert them from one thread.
+
+    workers defaults to the number of CPUs. progress, if given, is called
+    with the report after every written batch. Imports the same rows, with
+    the same rejections, as bulk.import_rows.
+    """
+    if upsert and entity_type not in UPSERTERS:
+        raise ValueError(f"{entity_type.title()}s have no unique key to upsert on.")
+    workers = workers or os.cpu_count() or 1
+    report = IngestReport()
+    started = time.perf_counter()
+    refs = _References(session) if entity_type == "book" else None
+    session.commit()  # from here on only the writer thread touches the session
+    writer = _Writer(session, entity_type, report, upsert, progress, queue_size)
+    writer.start()
+    rows = iter(rows)
+    pending = deque()
+
+    def hand_over(future):
+        # Time spent here is the reader waiting for a worker or for room in the queue.
+        start = time.perf_counter()
+        batch, rejected, elapsed = future.result()
+        report.rejected.extend(rejected)
+        report.timings["clean"] += elapsed
+        writer.queue.put(batch)  # blocks while the writer is queue_size shards behind
+        report.timings["waiting"] += time.perf_counter() - start
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(WORKER_START_METHOD),
+                                 initializer=_init_worker, initargs=(entity_type, refs)) as pool:
+            while writer.error is None:
+                start = time.perf_counter()
+                shard = list(itertools.islice(rows, batch_size))
+                report.timings["read"] += time.perf_counter() - start
+                if not shard:
+                    break
+                pending.append(pool.submit(_clean_shard, shard))
+                if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                    hand_over(pending.popleft())
+            while pending and writer.error is None:
+                hand_over(pending.popleft())
+            for future in pending:
+                future.cancel()
+    finally:
+        writer.queue.put(None)
+        writer.join()
+    if writer.error is not None:
+        raise writer.error
+    report.rejected.sort()
+    report.timings["total"] = time.perf_counter() - started
+    return report
+
+def ingest_file(session, entity_type, path, workers=None, batch_size=BATCH_SIZE, upsert=False, progress=None):
+    return ingest_rows(session, entity_type, read_rows(path), workers, batch_size, upsert, progress)
@@ -1,20 +1,47 @@
+import functools
+import importlib
+import json
 import click
-from crud import (
-    create_author, delete_author, get_all_authors, find_author_by_id, find_author_by_name,
-    create_publisher, delete_publisher, get_all_publishers, find_publisher_by_id, find_publisher_by_name,
-    create_book, delete_book, get_all_books, find_book_by_id, find_book_by_title, get_books_by_author,
-    get_books_by_publisher, get_book_relations
-)
-from models import Session
+from profiling import PROFILER, SLOW_QUERY_MS
+
+def lazy(module, name):
+    """Stand-in for module.name that imports module on its first call.
+
+    SQLAlchemy, the models and the engine are only loaded once a menu action
+    or subcommand touches the database, so the menu and --help show at once.
+    """
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module), name)(*args, **kwargs)
+    call.__name__ = name
+    return call
+
+Session = lazy("models", "Session")
+configure_engine = lazy("models", "configure_engine")
+get_engine = lazy("models", "get_engine")
+persist = lazy("crud", "persist")
+check_version = lazy("crud", "check_version")
+unit_of_work = lazy("crud", "unit_of_work")
+REPORTS_MODULE = "reports"  # "snapshot" after use_snapshot()
+LIST_PAGE_SIZE = 50
 
 # Menu definitions
 MAIN_MENU = [
     ("Manage Authors", "author"),
     ("Manage Publishers", "publisher"),
     ("Manage Books", "book"),
+    ("Reports", "report"),
     ("Exit", "exit")
 ]
 
+# (title, name in reports.REPORTS)
+REPORT_MENU = [
+    ("Books per genre", "genre"),
+    ("Books per publisher", "publisher"),
+    ("Books per author", "author"),
+    ("Books per decade", "decade"),
+    ("Back", "back")
+]
+
 ENTITY_MENUS = {
     "author": [
         "Add new author",
@@ -24,6 +51,7 @@ ENTITY_MENUS = {
         "Find author by ID",
         "Find author by name",
         "List books by author",
+        "Search authors",
         "Back"
     ],
     "publisher": [
@@ -44,6 +72,7 @@ ENTITY_MENUS = {
         "Find book by ID",
         "Find book by title",
         "View author and publisher",
+        "Search books",
         "Back"
     ]
 }
@@ -74,28 +103,43 @@ ENTITY_FIELDS = {
 # Entity-specific CRUD functions
 ENTITY_CRUD = {
     "author": {
-        "create": create_author,
-        "delete": delete_author,
-        "list": get_all_authors,
-        "find_by_id": find_author_by_id,
-        "find_by_name": find_author_by_name,
-        "list_related": get_books_by_author
+        "create": lazy("crud", "create_author"),
+        "validate": lazy("crud", "validate_author"),
+        "delete": lazy("crud", "delete_author"),
+        "list": lazy("crud", "get_all_authors"),
+        "page": lazy("crud", "get_authors_page"),
+        "iter": lazy("crud", "iter_authors"),
+        "find_by_id": lazy("crud", "find_author_by_id"),
+        "find_by_name": lazy("crud", "find_author_by_name"),
+        "list_related": lazy("crud", "get_books_by_author"),
+        "related_page": lazy("crud", "get_books_by_author_page"),
+        "iter_related": lazy("crud", "iter_books_by_author"),
+        "search": lazy("crud", "search_authors")
     },
     "publisher": {
-        "create": create_publisher,
-        "delete": delete_publisher,
-        "list": get_all_publishers,
-        "find_by_id": find_publisher_by_id,
-        "find_by_name": find_publisher_by_name,
-        "list_related": get_books_by_publisher
+        "create": lazy("crud", "create_publisher"),
+        "validate": lazy("crud", "validate_publisher"),
+        "delete": lazy("crud", "delete_publisher"),
+        "list": lazy("crud", "get_all_publishers"),
+        "page": lazy("crud", "get_publishers_page"),
+        "iter": lazy("crud", "iter_publishers"),
+        "find_by_id": lazy("crud", "find_publisher_by_id"),
+        "find_by_name": lazy("crud", "find_publisher_by_name"),
+        "list_related": lazy("crud", "get_books_by_publisher"),
+        "related_page": lazy("crud", "get_books_by_publisher_page"),
+        "iter_related": lazy("crud", "iter_books_by_publisher")
     },
     "book": {
-        "create": create_book,
-        "delete": delete_book,
-        "list": get_all_books,
-        "find_by_id": find_book_by_id,
-        "find_by_name": find_book_by_title,
-        "list_related": get_book_relations
+        "create": lazy("crud", "create_book"),
+        "validate": lazy("crud", "validate_book"),
+        "delete": lazy("crud", "delete_book"),
+        "list": lazy("crud", "get_all_books_with_relations"),
+        "page": lazy("crud", "get_books_page"),
+        "iter": lazy("crud", "iter_books"),
+        "find_by_id": lazy("crud", "find_book_with_relations_by_id"),
+        "find_by_name": lazy("crud", "find_book_with_relations_by_title"),
+        "list_related": lazy("crud", "get_book_relations"),
+        "search": lazy("crud", "search_books")
     }
 }
 
@@ -107,26 +151,137 @@ def get_entity_label(entity):
         getattr(entity, "name", getattr(entity, "title", "Unknown"))
     )
 
-def list_entity(session, entity_type):
-    """List all entities of a given type."""
-    entities = ENTITY_CRUD[entity_type]["list"](session)
-    if not entities:
+def format_entity(entity_type, e):
+    """Return the one-line listing/detail text for an entity."""
+    if entity_type == "author":
+        return (f"{e.id}. {e.full_name} - Birth Year: {e.birth_year}, Nationality: {e.nationality}, "
+                f"Books: {e.book_count}")
+    elif entity_type == "publisher":
+        return (f"{e.id}. {e.name} - Founded: {e.founded_year}, Location: {e.location}, Website: {e.website or 'N/A'}, "
+                f"Books: {e.book_count}")
+    else:  # book
+        return (f"{e.id}. {e.title} - Year: {e.publication_year}, Genre: {e.genre}, "
+                f"Author: {e.author.full_name if e.author else 'Unknown'}, Publisher: {e.publisher.name if e.publisher else 'Unknown'}")
+
+def entity_to_dict(entity):
+    """Return an entity's column values as a JSON-serialisable dict."""
+    names = getattr(entity, "column_names", None) or [column.name for column in entity.__table__.columns]
+    return {name: getattr(entity, name) for name in names}
+
+# Message for an update that collides with another row's unique column
+UNIQUE_MESSAGES = {
+    "publisher": "Publisher name must be unique.",
+    "book": "Book title must be unique."
+}
+
+def update_entity(session, entity_type, entity, fields, version_id=None):
+    """Validate the entity's values with fields applied, then save them.
+
+    Only the ENTITY_FIELDS of entity_type can be changed, and a book's author
+    and publisher must exist, as for create_*. The save only goes through
+    while the row is at version_id (default: the version entity was loaded
+    at). If someone else changed or deleted it in the meantime, ValueError is
+    raised instead of overwriting their edit.
+    """
+    names = [f[0] for f in ENTITY_FIELDS[entity_type]]
+    for key in fields:
+        if key not in names:
+            raise ValueError(f"Unknown field '{key}'.")
+    values = {name: fields.get(name, getattr(entity, name)) for name in names}
+    ENTITY_CRUD[entity_type]["validate"](**values)
+    if entity_type == "book":
+        if not ENTITY_CRUD["author"]["find_by_id"](session, values["author_id"]):
+            raise ValueError("Author not found.")
+        if not ENTITY_CRUD["publisher"]["find_by_id"](session, values["publisher_id"]):
+            raise ValueError("Publisher not found.")
+    if version_id is None:
+        version_id = entity.version_id
+
+    def apply():
+        check_version(entity, version_id)
+        for key, value in fields.items():
+            setattr(entity, key, value)
+
+    from sqlalchemy.exc import IntegrityError  # imported here to keep SQLAlchemy off the startup path
+    try:
+        persist(session, apply)
+    except IntegrityError:
+        if entity_type in UNIQUE_MESSAGES:
+            raise ValueError(UNIQUE_MESSAGES[entity_type])
+        raise
+    return entity
+
+def list_entity(session, entity_type, page_size=LIST_PAGE_SIZE, get_page=None, heading=None):
+    """List entities of a given type one page at a time.
+
+    get_page(session, after_id, page_size) defaults to the entity's "page"
+    function; heading replaces the "All ..." title.
+    """
+    get_page = get_page or ENTITY_CRUD[entity_type]["page"]
+    after_id = 0
+    page = get_page(session, after_id, page_size)
+    if not page:
         click.echo(f"No {entity_type}s found.")
         return
-    click.echo(f"\n--- All {entity_type.title()}s ---")
-    for e in entities:
-        if entity_type == "author":
-            click.echo(f"{e.id}. {e.full_name} - Birth Year: {e.birth_year}, Nationality: {e.nationality}")
-        elif entity_type == "publisher":
-            click.echo(f"{e.id}. {e.name} - Founded: {e.founded_year}, Location: {e.location}, Website: {e.website or 'N/A'}")
-        else:  # book
-            author = find_author_by_id(session, e.author_id)
-            publisher = find_publisher_by_id(session, e.publisher_id)
-            click.echo(f"{e.id}. {e.title} - Year: {e.publication_year}, Genre: {e.genre}, "
-                       f"Author: {author.full_name if author else 'Unknown'}, Publisher: {publisher.name if publisher else 'Unknown'}")
-
-def run_menu(session, menu_type, menu_options, entity_type=None):
-    """Generic menu handler for main or entity menus."""
+    click.echo(f"\n--- {heading or f'All {entity_type.title()}s'} ---")
+    for e in page:
+        click.echo(format_entity(entity_type, e))
+    if len(page) < page_size:
+        return
+    previous = []  # after_id of every page we moved away from, for "prev"
+    while True:
+        action = click.prompt(
+            "[n]ext, [p]rev, [j]ump to ID, [q]uit",
+            type=click.Choice(["n", "p", "j", "q"]),
+            default="q",
+            show_choices=False
+        )
+        if action == "q":
+            return
+        if action == "n":
+            next_page = get_page(session, page[-1].id, page_size)
+            if not next_page:
+                click.echo("End of list.")
+                continue
+            previous.append(after_id)
+            after_id = page[-1].id
+        elif action == "p":
+            if not previous:
+                click.echo("Already at the first page.")
+                continue
+            after_id = previous.pop()
+            next_page = get_page(session, after_id, page_size)
+        else:
+            jump_id = click.prompt("Jump to ID", type=int)
+            next_page = get_page(session, jump_id - 1, page_size)
+            if not next_page:
+                click.echo(f"No {entity_type}s from ID {jump_id}.")
+                continue
+            previous.append(after_id)
+            after_id = jump_id - 1
+        page = next_page
+        click.echo(f"\n--- {entity_type.title()}s from ID {page[0].id} ---")
+        for e in page:
+            click.echo(format_entity(entity_type, e))
+
+def run_action(handler, entity_type, choice):
+    """Run one menu action in a session of its own, so it sees other users' latest writes."""
+    session = Session()
+    try:
+        handler(session, entity_type, choice)
+        session.commit()
+    except ValueError as e:  # e.g. a write against a read-only snapshot, or a stale update
+        click.echo(f"Error: {e}")
+    finally:
+        session.close()
+
+def run_menu(menu_type, menu_options, entity_type=None, handler=None):
+    """Generic menu handler for main or entity menus.
+
+    Choices are passed to handler (default handle_entity_action) as
+    handler(session, entity_type, choice), with a new session each time.
+    """
+    handler = handler or handle_entity_action
     while True:
         click.echo(f"\n--- {menu_type} ---")
 
@@ -150,13 +305,15 @@ def run_menu(session, menu_type, menu_options, entity_type=None):
             elif menu_options[choice][1] == "back":
                 return None
             elif entity_type:
-                handle_entity_action(session, entity_type, choice)
+                with PROFILER.action(f"{entity_type}: {menu_options[choice][0]}"):
+                    run_action(handler, entity_type, choice)
             else:
                 return menu_options[choice][1]
         else:
             if menu_options[choice].lower().startswith("back"):
                 return None
-            handle_entity_action(session, entity_type, choice)
+            with PROFILER.action(f"{entity_type}: {menu_options[choice]}"):
+                run_action(handler, entity_type, choice)
 
 def handle_entity_action(session, entity_type, choice):
     """Handle entity-specific actions based on menu choice."""
@@ -179,14 +336,13 @@ def handle_entity_action(session, entity_type, choice):
         if not entity:
             click.echo(f"{entity_type.title()} not found.")
             return
+        version_id = entity.version_id  # what the prompts' defaults show
         fields = {f[0]: click.prompt(f"{f[1]} [{getattr(entity, f[0], 'N/A')}]", type=f[2], default=getattr(entity, f[0])) for f in ENTITY_FIELDS[entity_type]}
         try:
             if entity_type == "book":
                 list_entity(session, "author")
                 list_entity(session, "publisher")
-            for key, value in fields.items():
-                setattr(entity, key, value)
-            session.commit()
+            update_entity(session, entity_type, entity, fields, version_id)
             click.echo(f"{entity_type.title()} '{get_entity_label(entity)}' updated successfully!")
         except ValueError as e:
             click.echo(f"Error: {e}")
@@ -201,15 +357,7 @@ def handle_entity_action(session, entity_type, choice):
         entity_id = click.prompt(f"Enter {entity_type.title()} ID", type=int)
         entity = ENTITY_CRUD[entity_type]["find_by_id"](session, entity_id)
         if entity:
-            if entity_type == "author":
-                click.echo(f"{entity.id}. {entity.full_name} - Birth Year: {entity.birth_year}, Nationality: {entity.nationality}")
-            elif entity_type == "publisher":
-                click.echo(f"{entity.id}. {entity.name} - Founded: {entity.founded_year}, Location: {entity.location}, Website: {entity.website or 'N/A'}")
-            else:  # book
-                author = find_author_by_id(session, entity.author_id)
-                publisher = find_publisher_by_id(session, entity.publisher_id)
-                click.echo(f"{entity.id}. {entity.title} - Year: {entity.publication_year}, Genre: {entity.genre}, "
-                           f"Author: {author.full_name if author else 'Unknown'}, Publisher: {publisher.name if publisher else 'Unknown'}")
+            click.echo(format_entity(entity_type, entity))
         else:
             click.echo(f"{entity_type.title()} not found.")
     elif choice == 5:  # Find by name/title
@@ -217,15 +365,7 @@ def handle_entity_action(session, entity_type, choice):
         name = click.prompt(f"Enter {name_field}", type=str)
         entity = ENTITY_CRUD[entity_type]["find_by_name"](session, name)
         if entity:
-            if entity_type == "author":
-                click.echo(f"{entity.id}. {entity.full_name} - Birth Year: {entity.birth_year}, Nationality: {entity.nationality}")
-            elif entity_type == "publisher":
-                click.echo(f"{entity.id}. {entity.name} - Founded: {entity.founded_year}, Location: {entity.location}, Website: {entity.website or 'N/A'}")
-            else:  # book
-                author = find_author_by_id(session, entity.author_id)
-                publisher = find_publisher_by_id(session, entity.publisher_id)
-                click.echo(f"{entity.id}. {entity.title} - Year: {entity.publication_year}, Genre: {entity.genre}, "
-                           f"Author: {author.full_name if author else 'Unknown'}, Publisher: {publisher.name if publisher else 'Unknown'}")
+            click.echo(format_entity(entity_type, entity))
         else:
             click.echo(f"{entity_type.title()} not found.")
     elif choice == 6:  # List related (books for author/publisher, author/publisher for book)
@@ -241,28 +381,375 @@ def handle_entity_action(session, entity_type, choice):
             click.echo(f"Author: {get_entity_label(author) if author else 'Unknown'}")
             click.echo(f"Publisher: {get_entity_label(publisher) if publisher else 'Unknown'}")
         else:
-            books = ENTITY_CRUD[entity_type]["list_related"](session, entity_id)
-            if not books:
-                click.echo(f"No books found for {get_entity_label(entity)}.")
-                return
-            click.echo(f"\n--- Books by {get_entity_label(entity)} ---")
-            for book in books:
-                click.echo(f"{book.id}. {book.title} - Year: {book.publication_year}, Genre: {book.genre}")
-
-@click.command()
-def main():
-    """Library Management System CLI"""
+            def get_page(session, after_id, page_size):
+                return ENTITY_CRUD[entity_type]["related_page"](session, entity_id, after_id, page_size)
+
+            list_entity(session, "book", get_page=get_page,
+                        heading=f"Books by {get_entity_label(entity)} ({entity.book_count})")
+    elif choice == 7:  # Search (authors and books only)
+        query = click.prompt("Search for", type=str)
+        matches = ENTITY_CRUD[entity_type]["search"](session, query)
+        if not matches:
+            click.echo(f"No {entity_type}s match '{query}'.")
+            return
+        click.echo(f"\n--- {entity_type.title()}s matching '{query}' ---")
+        for e in matches:
+            click.echo(format_entity(entity_type, e))
+
+def format_report_label(name, label):
+    return f"{label}s" if name == "decade" else label
+
+def run_report(session, name, **kwargs):
+    return importlib.import_module(REPORTS_MODULE).REPORTS[name](session, **kwargs)
+
+def handle_report_action(session, entity_type, choice):
+    """Print the report picked from REPORT_MENU."""
+    title, name = REPORT_MENU[choice]
+    rows = run_report(session, name)
+    if not rows:
+        click.echo("No books found.")
+        return
+    click.echo(f"\n--- {title} ---")
+    for label, count in rows:
+        click.echo(f"{format_report_label(name, label)}: {count}")
+
+# Non-interactive subcommands: "authors", "publishers" and "books" groups built
+# from ENTITY_CRUD/ENTITY_FIELDS, plus "batch" for files of operations.
+ENTITY_GROUPS = {
+    "author": "authors",
+    "publisher": "publishers",
+    "book": "books"
+}
+
+OUTPUT_FORMATS = ["text", "json", "ndjson"]
+
+def output_option(command):
+    return click.option("--format", "output_format", type=click.Choice(OUTPUT_FORMATS), default="text",
+                        show_default=True, help="Output format.")(command)
+
+def with_session(command):
+    """Run a subcommand with a fresh session and report ValueErrors as CLI errors."""
+    @functools.wraps(command)
+    def wrapper(*args, **kwargs):
+        session = Session()
+        try:
+            with PROFILER.action(click.get_current_context().command_path.split(" ", 1)[-1]):
+                return command(session, *args, **kwargs)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        finally:
+            session.close()
+    return wrapper
+
+def write_entities(entity_type, entities, output_format):
+    """Stream entities to stdout as text lines, one JSON array, or NDJSON."""
+    if output_format == "json":
+        click.echo("[", nl=False)
+        for i, e in enumerate(entities):
+            click.echo(("," if i else "") + json.dumps(entity_to_dict(e)), nl=False)
+        click.echo("]")
+    else:
+        for e in entities:
+            click.echo(format_entity(entity_type, e) if output_format == "text" else json.dumps(entity_to_dict(e)))
+
+def write_entity(entity_type, entity, output_format):
+    if output_format == "text":
+        click.echo(format_entity(entity_type, entity))
+    else:
+        click.echo(json.dumps(entity_to_dict(entity)))
+
+def field_options(entity_type, required):
+    """click options for ENTITY_FIELDS, e.g. --first-name; optional fields are never required."""
+    def decorate(command):
+        for name, label, field_type, default in reversed(ENTITY_FIELDS[entity_type]):
+            command = click.option(f"--{name.replace('_', '-')}", name, type=field_type, default=default,
+                                   required=required and "optional" not in label, help=label)(command)
+        return command
+    return decorate
+
+def find_or_fail(session, entity_type, entity_id):
+    entity = ENTITY_CRUD[entity_type]["find_by_id"](session, entity_id)
+    if not entity:
+        raise click.ClickException(f"{entity_type.title()} not found.")
+    return entity
+
+def entity_group(entity_type):
+    """Build the click group for one entity type."""
+    crud = ENTITY_CRUD[entity_type]
+    name_option = "--title" if entity_type == "book" else "--name"
+
+    @click.group(name=ENTITY_GROUPS[entity_type], help=f"Manage {entity_type}s.")
+    def group():
+        pass
+
+    @group.command("list")
+    @click.option("--page-size", default=1000, show_default=True, help="Rows fetched per query.")
+    @output_option
+    @with_session
+    def list_command(session, page_size, output_format):
+        """List every record, streamed in id order."""
+        write_entities(entity_type, crud["iter"](session, page_size), output_format)
+
+    @group.command("add")
+    @field_options(entity_type, required=True)
+    @output_option
+    @with_session
+    def add_command(session, output_format, **fields):
+        """Add a record."""
+        write_entity(entity_type, crud["create"](session, **fields), output_format)
+
+    @group.command("update")
+    @click.argument("entity_id", type=int)
+    @field_options(entity_type, required=False)
+    @click.option("--version-id", type=int, default=None,
+                  help="Only update if the record is still at this version_id (shown by --format json).")
+    @output_option
+    @with_session
+    def update_command(session, entity_id, version_id, output_format, **fields):
+        """Change the given fields of a record."""
+        entity = find_or_fail(session, entity_type, entity_id)
+        fields = {key: value for key, value in fields.items() if value is not None}
+        write_entity(entity_type, update_entity(session, entity_type, entity, fields, version_id), output_format)
+
+    @group.command("delete")
+    @click.argument("entity_id", type=int)
+    @with_session
+    def delete_command(session, entity_id):
+        """Delete a record."""
+        if not crud["delete"](session, entity_id):
+            raise click.ClickException(f"{entity_type.title()} not found.")
+        click.echo(f"{entity_type.title()} {entity_id} deleted.")
+
+    @group.command("find")
+    @click.option("--id", "entity_id", type=int, help="Find by ID.")
+    @click.option(name_option, "name", help=f"Find by {'full name' if entity_type == 'author' else name_option[2:]}.")
+    @output_option
+    @with_session
+    def find_command(session, entity_id, name, output_format):
+        """Find one record by ID or by name/title."""
+        if (entity_id is None) == (name is None):
+            raise click.UsageError(f"Give exactly one of --id or {name_option}.")
+        if entity_id is not None:
+            entity = find_or_fail(session, entity_type, entity_id)
+        else:
+            entity = crud["find_by_name"](session, name)
+            if not entity:
+                raise click.ClickException(f"{entity_type.title()} not found.")
+        write_entity(entity_type, entity, output_format)
+
+    @group.command("related")
+    @click.argument("entity_id", type=int)
+    @output_option
+    @with_session
+    def related_command(session, entity_id, output_format):
+        """Show the books of an author/publisher, or the author and publisher of a book."""
+        find_or_fail(session, entity_type, entity_id)
+        if entity_type == "book":
+            author, publisher = crud["list_related"](session, entity_id)
+            if output_format == "text":
+                click.echo(f"Author: {get_entity_label(author) if author else 'Unknown'}")
+                click.echo(f"Publisher: {get_entity_label(publisher) if publisher else 'Unknown'}")
+            else:
+                click.echo(json.dumps({
+                    "author": entity_to_dict(author) if author else None,
+                    "publisher": entity_to_dict(publisher) if publisher else None
+                }))
+        else:
+            write_entities("book", crud["iter_related"](session, entity_id), output_format)
+
+    if "search" in crud:
+        @group.command("search")
+        @click.argument("query")
+        @output_option
+        @with_session
+        def search_command(session, query, output_format):
+            """Ranked full-text search."""
+            write_entities(entity_type, crud["search"](session, query), output_format)
+
+    return group
+
+def run_operation(session, operation):
+    """Execute one batch operation and return its JSON-serialisable result.
+
+    Operations look like {"entity": "book", "action": "add", "fields": {...}};
+    update/delete/get take "id", find takes "name". update also takes an
+    optional "version_id" the record must still be at.
+    """
+    entity_type = operation.get("entity")
+    action = operation.get("action")
+    if entity_type not in ENTITY_CRUD:
+        raise ValueError(f"Unknown entity '{entity_type}'.")
+    crud = ENTITY_CRUD[entity_type]
+    with PROFILER.action(f"batch {entity_type} {action}"):
+        if action == "add":
+            return entity_to_dict(crud["create"](session, **operation.get("fields", {})))
+        if action == "delete":
+            if not crud["delete"](session, operation["id"]):
+                raise ValueError(f"{entity_type.title()} not found.")
+            return None
+        if action in ("update", "get"):
+            entity = crud["find_by_id"](session, operation["id"])
+            if not entity:
+                raise ValueError(f"{entity_type.title()} not found.")
+            if action == "update":
+                update_entity(session, entity_type, entity, operation.get("fields", {}), operation.get("version_id"))
+            return entity_to_dict(entity)
+        if action == "find":
+            entity = crud["find_by_name"](session, operation["name"])
+            return entity_to_dict(entity) if entity else None
+        raise ValueError(f"Unknown action '{action}'.")
+
+@click.command("batch")
+@click.argument("operations", type=click.File("r"))
+def batch_command(operations):
+    """Run a JSONL file of operations in one transaction ("-" reads stdin).
+
+    Each result is written as an NDJSON line. The first failing operation
+    rolls the whole batch back.
+    """
     session = Session()
     try:
-        while True:
-            result = run_menu(session, "Library Management CLI", MAIN_MENU)
-            if result == "exit":
-                click.echo("Exiting... Goodbye!")
-                break
-            elif result:
-                run_menu(session, f"{result.title()} Menu", ENTITY_MENUS[result], result)
+        # No per-operation SAVEPOINTs: any failure aborts the whole unit anyway.
+        with unit_of_work(session, savepoints=False):
+            for line_no, line in enumerate(operations, 1):
+                if not line.strip():
+                    continue
+                try:
+                    result = run_operation(session, json.loads(line))
+                except KeyError as e:
+                    raise click.ClickException(f"Line {line_no}: missing {e}.")
+                except (ValueError, TypeError) as e:
+                    raise click.ClickException(f"Line {line_no}: {e}")
+                click.echo(json.dumps({"line": line_no, "result": result}))
     finally:
         session.close()
 
+@click.command("reports")
+@click.argument("name", type=click.Choice([name for title, name in REPORT_MENU[:-1]]))
+@click.option("--limit", type=int, default=None, help="Number of rows (0 for all; default depends on the report).")
+@click.option("--live", is_flag=True, help="Count with GROUP BY over books instead of the summary table.")
+@output_option
+@with_session
+def reports_command(session, name, limit, live, output_format):
+    """Book counts per genre, publisher, author or decade."""
+    kwargs = {"live": live}
+    if limit is not None:
+        kwargs["limit"] = limit or None
+    rows = run_report(session, name, **kwargs)
+    if output_format == "json":
+        click.echo(json.dumps([{name: label, "books": count} for label, count in rows]))
+    else:
+        for label, count in rows:
+            if output_format == "text":
+                click.echo(f"{format_report_label(name, label)}: {count}")
+            else:
+                click.echo(json.dumps({name: label, "books": count}))
+
+def write_profile(path=None):
+    """Print the profiler report to stderr, or dump it as JSON to path."""
+    if path:
+        PROFILER.dump(path)
+    else:
+        click.echo(PROFILER.format_report(), err=True)
+
+def use_snapshot(path):
+    """Serve every read from the snapshot file at path instead of the database; writes fail."""
+    global Session, REPORTS_MODULE
+    snapshot = importlib.import_module("snapshot").open_snapshot(path)
+    Session = lambda: snapshot
+    REPORTS_MODULE = "snapshot"
+    for ops in ENTITY_CRUD.values():
+        for key, function in ops.items():
+            if key != "validate":
+                ops[key] = lazy("snapshot", function.__name__)
+
+@click.command("snapshot")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@with_session
+def snapshot_command(session, path):
+    """Export the catalog to a read-only snapshot file for --snapshot."""
+    counts = lazy("snapshot", "export_snapshot")(session, path)
+    click.echo(f"Wrote {counts['authors']} authors, {counts['publishers']} publishers and "
+               f"{counts['books']} books to {path}.")
+
+@click.group("changes")
+def changes_group():
+    """Incremental sync from the change log."""
+
+@changes_group.command("list")
+@click.option("--since", type=int, default=0, show_default=True, help="Only changes after this sequence number.")
+@output_option
+@with_session
+def changes_list_command(session, since, output_format):
+    """Stream every change after --since with the row's current values."""
+    changes = lazy("changes", "iter_changes")(session, since)
+    if output_format == "json":
+        click.echo("[", nl=False)
+        for i, change in enumerate(changes):
+            click.echo(("," if i else "") + json.dumps(change), nl=False)
+        click.echo("]")
+    else:
+        for change in changes:
+            if output_format == "text":
+                click.echo(f"{change['seq']}. {change['operation']} {change['entity']} {change['id']}")
+            else:
+                click.echo(json.dumps(change))
+
+@changes_group.command("latest")
+@with_session
+def changes_latest_command(session):
+    """Print the newest sequence number, where a fresh consumer can start after a full export."""
+    click.echo(lazy("changes", "latest_seq")(session))
+
+@changes_group.command("compact")
+@click.option("--through", type=int, default=None, help="Only compact changes up to this sequence number.")
+@with_session
+def changes_compact_command(session, through):
+    """Drop changes superseded by a later change to the same row."""
+    click.echo(f"Removed {lazy('changes', 'compact_changes')(session, through)} superseded changes.")
+
+@click.group(invoke_without_command=True)
+@click.option("--database-url", default=None,
+              help="SQLAlchemy database URL (default: $LIBRARY_DATABASE_URL, then alembic.ini).")
+@click.option("--profile", is_flag=True, help="Print statement counts and timings per action and crud function on exit.")
+@click.option("--profile-output", type=click.Path(dir_okay=False, writable=True), default=None,
+              help="Write the profile as JSON to this file (implies --profile).")
+@click.option("--slow-query-ms", type=float, default=SLOW_QUERY_MS, show_default=True,
+              help="Log statements slower than this while profiling.")
+@click.option("--snapshot", "snapshot_path", type=click.Path(exists=True, dir_okay=False), default=None,
+              help="Browse a snapshot file (see the snapshot command) instead of the database; read-only.")
+@click.pass_context
+def main(ctx, database_url, profile, profile_output, slow_query_ms, snapshot_path):
+    """Library Management System CLI
+
+    Without a subcommand, starts the interactive menus.
+    """
+    if database_url:
+        configure_engine(database_url)
+    if snapshot_path:
+        use_snapshot(snapshot_path)
+    if profile or profile_output:
+        PROFILER.slow_query_ms = slow_query_ms
+        PROFILER.enable(get_engine())
+        ctx.call_on_close(lambda: write_profile(profile_output))
+    if ctx.invoked_subcommand is not None:
+        return
+    while True:
+        result = run_menu("Library Management CLI", MAIN_MENU)
+        if result == "exit":
+            click.echo("Exiting... Goodbye!")
+            break
+        if result == "report":
+            run_menu("Reports Menu", REPORT_MENU, result, handle_report_action)
+        elif result:
+            run_menu(f"{result.title()} Menu", ENTITY_MENUS[result], result)
+
+for entity_type in ENTITY_CRUD:
+    main.add_command(entity_group(entity_type))
+main.add_command(batch_command)
+main.add_command(reports_command)
+main.add_command(snapshot_command)
+main.add_command(changes_group)
+
 if __name__ == "__main__":
     main()
@@ -1,21 +1,135 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
+import configparser
+import os
+from sqlalchemy import create_engine, event, func, select, DDL, Column, Integer, String, ForeignKey, Index
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, column_property
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+LIB_DIR = os.path.dirname(os.path.abspath(__file__))
+ALEMBIC_INI = os.path.join(LIB_DIR, '..', 'alembic.ini')
+DATABASE_URL_ENV = 'LIBRARY_DATABASE_URL'
+DEFAULT_DATABASE_URL = 'sqlite:///' + os.path.join(LIB_DIR, 'db', 'library.db')
+
+# Pool settings for server databases; file-based SQLite uses the same QueuePool sizes.
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_RECYCLE = 1800
+SQLITE_BUSY_TIMEOUT = 30
+WRITE_LOCK = 'sqlite_write_lock'  # execution option: start SQLite transactions with BEGIN IMMEDIATE
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'mmap_size': 268435456,  # 256 MiB
+    'cache_size': -65536,  # 64 MiB
+    'temp_store': 'MEMORY'
+}
+
+def database_url():
+    """Return the database URL from $LIBRARY_DATABASE_URL, alembic.ini or the bundled default.
+
+    Relative SQLite paths in alembic.ini are resolved against the repository
+    root, so the app and migrations agree regardless of the working directory.
+    """
+    url = os.environ.get(DATABASE_URL_ENV)
+    if url:
+        return url
+    config = configparser.ConfigParser()
+    if config.read(ALEMBIC_INI) and config.has_option('alembic', 'sqlalchemy.url'):
+        url = make_url(config.get('alembic', 'sqlalchemy.url'))
+        if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:' \
+                and not os.path.isabs(url.database):
+            url = url.set(database=os.path.normpath(os.path.join(os.path.dirname(ALEMBIC_INI), url.database)))
+        return url.render_as_string(hide_password=False)
+    return DEFAULT_DATABASE_URL
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Take transaction control away from pysqlite so SAVEPOINTs nest inside a
+    # real BEGIN (see "Serializable isolation / Savepoints" in the SQLAlchemy
+    # SQLite dialect docs); _begin_sqlite_transaction emits the BEGIN.
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+def _begin_sqlite_transaction(connection):
+    # With WRITE_LOCK the transaction takes the write lock at BEGIN, waiting up
+    # to SQLITE_BUSY_TIMEOUT for it, so a later write cannot fail because
+    # another connection committed since this one started reading.
+    immediate = connection.get_execution_options().get(WRITE_LOCK)
+    connection.exec_driver_sql('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+
+def build_engine(url=None):
+    """Create an engine for url (default: database_url()) with pooling and, for SQLite, tuned pragmas."""
+    url = make_url(url or database_url())
+    if url.get_backend_name() == 'sqlite':
+        if url.database and url.database != ':memory:':
+            engine = create_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                                   connect_args={'timeout': SQLITE_BUSY_TIMEOUT})
+        else:
+            engine = create_engine(url)
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
+        event.listen(engine, 'begin', _begin_sqlite_transaction)
+        return engine
+    return create_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                         pool_recycle=POOL_RECYCLE, pool_pre_ping=True)
+
+_engine = None
+
+def get_engine():
+    """Return the engine, building it from database_url() on first use."""
+    global _engine
+    if _engine is None:
+        _engine = build_engine()
+    return _engine
+
+def __getattr__(name):
+    # models.ENGINE is created on first access instead of at import.
+    if name == 'ENGINE':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class _LazySessionmaker(sessionmaker):
+    """sessionmaker that binds to get_engine() when the first session is made."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get('bind') is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
 
-ENGINE = create_engine('sqlite:///lib/db/library.db')
 Base = declarative_base()
-Session = sessionmaker(bind=ENGINE)
+Session = _LazySessionmaker()
+
+def configure_engine(url):
+    """Point ENGINE and the Session factory at another database."""
+    global _engine
+    if _engine is not None:
+        _engine.dispose()
+    _engine = build_engine(url)
+    Session.configure(bind=_engine)
+    return _engine
 
 class Author(Base):
     __tablename__ = 'authors'
+    __table_args__ = (
+        Index('ix_authors_first_name_last_name', 'first_name', 'last_name'),
+    )
     
     id = Column(Integer, primary_key=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     birth_year = Column(Integer, nullable=False)
     nationality = Column(String, nullable=False)
+    _book_count = Column('book_count', Integer, nullable=False, default=0, server_default='0')  # read as book_count
+    version_id = Column(Integer, nullable=False, default=1, server_default='1')  # bumped by every update, see crud.persist
+    
+    __mapper_args__ = {'version_id_col': version_id}
     
-    books = relationship('Book', back_populates='author', cascade='all, delete-orphan')
+    books = relationship('Book', back_populates='author', cascade='all, delete-orphan', passive_deletes=True)
     
     @property
     def full_name(self):
@@ -39,24 +153,217 @@ class Publisher(Base):
     founded_year = Column(Integer, nullable=False)
     location = Column(String, nullable=False)
     website = Column(String)
+    _book_count = Column('book_count', Integer, nullable=False, default=0, server_default='0')  # read as book_count
+    version_id = Column(Integer, nullable=False, default=1, server_default='1')  # bumped by every update, see crud.persist
     
-    books = relationship('Book', back_populates='publisher', cascade='all, delete-orphan')
+    __mapper_args__ = {'version_id_col': version_id}
+    
+    books = relationship('Book', back_populates='publisher', cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f"Publisher(id={self.id}, name='{self.name}', founded_year={self.founded_year}, location='{self.location}')"
 
 class Book(Base):
     __tablename__ = 'books'
+    __table_args__ = (
+        Index('ix_books_genre_publication_year', 'genre', 'publication_year'),
+    )
     
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False, unique=True)
     publication_year = Column(Integer, nullable=False)
     genre = Column(String, nullable=False)
-    author_id = Column(Integer, ForeignKey('authors.id'), nullable=False)
-    publisher_id = Column(Integer, ForeignKey('publishers.id'), nullable=False)
+    author_id = Column(Integer, ForeignKey('authors.id', ondelete='CASCADE'), nullable=False, index=True)
+    publisher_id = Column(Integer, ForeignKey('publishers.id', ondelete='CASCADE'), nullable=False, index=True)
+    version_id = Column(Integer, nullable=False, default=1, server_default='1')  # bumped by every update, see crud.persist
+    
+    __mapper_args__ = {'version_id_col': version_id}
     
     author = relationship('Author', back_populates='books')
     publisher = relationship('Publisher', back_populates='books')
     
     def __repr__(self):
-        return f"Book(id={self.id}, title='{self.title}', year={self.publication_year}, genre='{self.genre}', author_id={self.author_id}, publisher_id={self.publisher_id})"
\ No newline at end of file
+        return f"Book(id={self.id}, title='{self.title}', year={self.publication_year}, genre='{self.genre}', author_id={self.author_id}, publisher_id={self.publisher_id})"
+
+class _BookCount(ColumnElement):
+    """An author's or publisher's number of books: the stored column on SQLite, a COUNT elsewhere."""
+    inherit_cache = True
+    _traverse_internals = [('stored', InternalTraversal.dp_clauseelement),
+                           ('count', InternalTraversal.dp_clauseelement)]
+    type = Integer()
+
+    def __init__(self, stored, foreign_key):
+        self.stored = stored
+        self.count = (select(func.count(Book.id)).where(foreign_key == stored.table.c.id)
+                      .correlate_except(Book).scalar_subquery())
+
+@compiles(_BookCount)
+def _compile_book_count(element, compiler, **kw):
+    return compiler.process(element.count, **kw)
+
+@compiles(_BookCount, 'sqlite')
+def _compile_stored_book_count(element, compiler, **kw):
+    return compiler.process(element.stored, **kw)
+
+# Only SQLite has the triggers that keep the stored column current (see
+# BOOK_COUNT_DDL), so other backends count the books when the row is loaded.
+Author.book_count = column_property(_BookCount(Author.__table__.c.book_count, Book.author_id))
+Publisher.book_count = column_property(_BookCount(Publisher.__table__.c.book_count, Book.publisher_id))
+
+class BookStat(Base):
+    """Running book count for one genre, decade, author or publisher, kept up to date by triggers on books."""
+    __tablename__ = 'book_stats'
+
+    dimension = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    book_count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"BookStat(dimension='{self.dimension}', key='{self.key}', book_count={self.book_count})"
+
+class Change(Base):
+    """One insert, update or delete of an author, publisher or book, recorded by triggers."""
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        Index('ix_change_log_entity_entity_id_seq', 'entity', 'entity_id', 'seq'),
+        {'sqlite_autoincrement': True}  # seq is never reused, even after compaction
+    )
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String, nullable=False)
+
+    def __repr__(self):
+        return f"Change(seq={self.seq}, entity='{self.entity}', entity_id={self.entity_id}, operation='{self.operation}')"
+
+# Full-text search: FTS5 indexes over books.title/genre and author names, kept
+# in sync by triggers. The *_vocab tables expose the indexed terms for fuzzy
+# matching. SQLite only; see alembic revision 9b1f0e6c4a27 for existing databases.
+FTS_DDL = {
+    Author.__table__: [
+        """CREATE VIRTUAL TABLE authors_fts USING fts5(
+            first_name, last_name, content='authors', content_rowid='id', prefix='2 3')""",
+        "CREATE VIRTUAL TABLE authors_fts_vocab USING fts5vocab(authors_fts, 'row')",
+        """CREATE TRIGGER authors_fts_ai AFTER INSERT ON authors BEGIN
+            INSERT INTO authors_fts(rowid, first_name, last_name) VALUES (new.id, new.first_name, new.last_name);
+        END""",
+        """CREATE TRIGGER authors_fts_ad AFTER DELETE ON authors BEGIN
+            INSERT INTO authors_fts(authors_fts, rowid, first_name, last_name)
+            VALUES ('delete', old.id, old.first_name, old.last_name);
+        END""",
+        """CREATE TRIGGER authors_fts_au AFTER UPDATE OF first_name, last_name ON authors BEGIN
+            INSERT INTO authors_fts(authors_fts, rowid, first_name, last_name)
+            VALUES ('delete', old.id, old.first_name, old.last_name);
+            INSERT INTO authors_fts(rowid, first_name, last_name) VALUES (new.id, new.first_name, new.last_name);
+        END"""
+    ],
+    Book.__table__: [
+        """CREATE VIRTUAL TABLE books_fts USING fts5(
+            title, genre, content='books', content_rowid='id', prefix='2 3')""",
+        "CREATE VIRTUAL TABLE books_fts_vocab USING fts5vocab(books_fts, 'row')",
+        """CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts(rowid, title, genre) VALUES (new.id, new.title, new.genre);
+        END""",
+        """CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, genre) VALUES ('delete', old.id, old.title, old.genre);
+        END""",
+        """CREATE TRIGGER books_fts_au AFTER UPDATE OF title, genre ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, genre) VALUES ('delete', old.id, old.title, old.genre);
+            INSERT INTO books_fts(rowid, title, genre) VALUES (new.id, new.title, new.genre);
+        END"""
+    ]
+}
+
+for table, statements in FTS_DDL.items():
+    for statement in statements:
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    for fts_table in (f'{table.name}_fts_vocab', f'{table.name}_fts'):
+        event.listen(table, 'before_drop', DDL(f'DROP TABLE IF EXISTS {fts_table}').execute_if(dialect='sqlite'))
+
+# Report summaries: every write to books adjusts the matching book_stats rows
+# in the same statement, so reports never scan books. SQLite only; see alembic
+# revision 2a7f4e9b3c15 for existing databases.
+STAT_KEYS = {
+    'genre': '{row}.genre',
+    'decade': 'CAST(({row}.publication_year / 10) * 10 AS TEXT)',
+    'author': 'CAST({row}.author_id AS TEXT)',
+    'publisher': 'CAST({row}.publisher_id AS TEXT)'
+}
+
+def _count_book(row):
+    return ''.join(
+        f"""INSERT INTO book_stats (dimension, key, book_count) VALUES ('{dimension}', {key.format(row=row)}, 1)
+            ON CONFLICT (dimension, key) DO UPDATE SET book_count = book_count + 1;"""
+        for dimension, key in STAT_KEYS.items()
+    )
+
+def _uncount_book(row):
+    return ''.join(
+        f"""UPDATE book_stats SET book_count = book_count - 1
+            WHERE dimension = '{dimension}' AND key = {key.format(row=row)};
+            DELETE FROM book_stats WHERE dimension = '{dimension}' AND key = {key.format(row=row)} AND book_count <= 0;"""
+        for dimension, key in STAT_KEYS.items()
+    )
+
+STATS_DDL = [
+    f"CREATE TRIGGER books_stats_ai AFTER INSERT ON books BEGIN {_count_book('new')} END",
+    f"CREATE TRIGGER books_stats_ad AFTER DELETE ON books BEGIN {_uncount_book('old')} END",
+    f"""CREATE TRIGGER books_stats_au AFTER UPDATE OF genre, publication_year, author_id, publisher_id ON books
+        BEGIN {_uncount_book('old')} {_count_book('new')} END"""
+]
+
+for statement in STATS_DDL:
+    event.listen(Book.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+# Cached relationship counts: authors.book_count and publishers.book_count
+# follow every insert, delete and reassignment of a book. SQLite only; see
+# alembic revision c5e1a8d4b7f2 for existing databases. Objects already
+# loaded in a session keep their old count until they are refreshed (every
+# commit expires them).
+def _add_to_counts(row, delta):
+    return f"""UPDATE authors SET book_count = book_count {delta} WHERE id = {row}.author_id;
+        UPDATE publishers SET book_count = book_count {delta} WHERE id = {row}.publisher_id;"""
+
+BOOK_COUNT_DDL = [
+    f"CREATE TRIGGER books_counts_ai AFTER INSERT ON books BEGIN {_add_to_counts('new', '+ 1')} END",
+    f"CREATE TRIGGER books_counts_ad AFTER DELETE ON books BEGIN {_add_to_counts('old', '- 1')} END",
+    f"""CREATE TRIGGER books_counts_au AFTER UPDATE OF author_id, publisher_id ON books
+        WHEN old.author_id IS NOT new.author_id OR old.publisher_id IS NOT new.publisher_id
+        BEGIN {_add_to_counts('old', '- 1')} {_add_to_counts('new', '+ 1')} END"""
+]
+
+for statement in BOOK_COUNT_DDL:
+    event.listen(Book.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+# Change data capture: every insert, update and delete on authors, publishers
+# and books appends a change_log row, including writes made by bulk
+# statements and the books removed by ON DELETE CASCADE. SQLite only; see
+# alembic revision 7d3b9e2f5a68 for existing databases.
+CHANGE_LOG_ENTITIES = {
+    'authors': 'author',
+    'publishers': 'publisher',
+    'books': 'book'
+}
+CHANGE_LOG_TRIGGERS = {
+    'ai': ('INSERT', 'new', 'insert'),
+    'au': ('UPDATE', 'new', 'update'),
+    'ad': ('DELETE', 'old', 'delete')
+}
+CHANGE_LOG_IGNORED = {'id', 'book_count', 'version_id'}  # updates to these alone are not logged
+
+def change_log_ddl(table):
+    """CREATE TRIGGER statements that log every change to table in change_log."""
+    entity = CHANGE_LOG_ENTITIES[table]
+    columns = ', '.join(c.name for c in Base.metadata.tables[table].columns if c.name not in CHANGE_LOG_IGNORED)
+    events = {'INSERT': 'INSERT', 'UPDATE': f'UPDATE OF {columns}', 'DELETE': 'DELETE'}
+    return [
+        f"""CREATE TRIGGER {table}_changes_{suffix} AFTER {events[event_name]} ON {table} BEGIN
+            INSERT INTO change_log (entity, entity_id, operation) VALUES ('{entity}', {row}.id, '{operation}');
+        END"""
+        for suffix, (event_name, row, operation) in CHANGE_LOG_TRIGGERS.items()
+    ]
+
+for table in CHANGE_LOG_ENTITIES:
+    for statement in change_log_ddl(table):
+        event.listen(Base.metadata.tables[table], 'after_create', DDL(statement).execute_if(dialect='sqlite'))
@@ -0,0 +1,214 @@
+"""Opt-in query instrumentation: statement counts, latency histograms and slow queries.
+
+Once enabled on an engine, every statement is timed with the
+before/after_cursor_execute events and charged to the outermost crud function
+running at the time and to the CLI action (see action()). Calls are counted
+for both. To know which crud function is running, enable() swaps every public
+function of the crud module, wherever it has been imported, for a wrapper that
+counts the call and marks it as the outermost one unless another crud
+function is already running; disable() puts the originals back. Nothing is
+recorded, and no event listener or wrapper is installed, until enable() is
+called.
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = [0.1, 0.5, 1, 5, 10, 50, 100, 500]
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG_SIZE = 50
+CRUD_MODULE = "crud"
+
+logger = logging.getLogger("library.slow_queries")
+
+class OperationStats:
+    """Counters for one crud function or CLI action."""
+
+    def __init__(self):
+        self.calls = 0
+        self.statements = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms):
+        self.statements += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def as_dict(self):
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "calls": self.calls,
+            "statements": self.statements,
+            "statements_per_call": self.statements / self.calls if self.calls else None,
+            "total_ms": round(self.total_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "histogram": {label: count for label, count in zip(labels, self.histogram) if count}
+        }
+
+class QueryProfiler:
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self.engines = []
+        self._action = contextvars.ContextVar("profiled_action", default=None)
+        self._function = contextvars.ContextVar("profiled_function", default=None)
+        self._wrappers = {}  # original crud function -> wrapper, while enabled
+        self.reset()
+
+    def reset(self):
+        self.functions = {}  # crud function name -> OperationStats
+        self.actions = {}  # CLI action label -> OperationStats
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+    @property
+    def enabled(self):
+        return bool(self.engines)
+
+    def enable(self, engine):
+        """Start timing every statement sent through engine."""
+        from sqlalchemy import event
+        if engine not in self.engines:
+            event.listen(engine, "before_cursor_execute", self._before_execute)
+            event.listen(engine, "after_cursor_execute", self._after_execute)
+            if not self.engines:
+                self._wrap_crud()
+            self.engines.append(engine)
+
+    def disable(self, engine=None):
+        """Stop timing statements on engine (default: every profiled engine)."""
+        from sqlalchemy import event
+        for profiled in [engine] if engine is not None else list(self.engines):
+            if profiled in self.engines:
+                event.remove(profiled, "before_cursor_execute", self._before_execute)
+                event.remove(profiled, "after_cursor_execute", self._after_execute)
+                self.engines.remove(profiled)
+                if not self.engines:
+                    self._unwrap_crud()
+
+    @contextmanager
+    def action(self, label):
+        """Charge the statements run inside the block to the CLI action label."""
+        if not self.enabled:
+            yield
+            return
+        self.actions.setdefault(label, OperationStats()).calls += 1
+        token = self._action.set(label)
+        try:
+            yield
+        finally:
+            self._action.reset(token)
+
+    def _wrap_crud(self):
+        import importlib
+        crud = importlib.import_module(CRUD_MODULE)
+        for name, function in vars(crud).items():
+            if not name.startswith("_") and inspect.isfunction(function) and function.__module__ == CRUD_MODULE:
+                self._wrappers[function] = self._wrap(name, function)
+        _rebind(self._wrappers)
+
+    def _unwrap_crud(self):
+        _rebind({wrapper: function for function, wrapper in self._wrappers.items()})
+        self._wrappers = {}
+
+    def _wrap(self, name, function):
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                outermost = self._start_call(name)
+                iterator = function(*args, **kwargs)
+                while True:
+                    # Only the generator's own steps run as name, not the
+                    # caller's loop body between them.
+                    token = self._function.set(name) if outermost else None
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        if token is not None:
+                            self._function.reset(token)
+                    yield item
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self._start_call(name):
+                    return function(*args, **kwargs)
+                token = self._function.set(name)
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self._function.reset(token)
+        return wrapper
+
+    def _start_call(self, name):
+        """Count a call to crud function name if no other one is running; return whether it is the outermost."""
+        if self._function.get() is not None:
+            return False
+        self.functions.setdefault(name, OperationStats()).calls += 1
+        return True
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["profiler_start"].pop()) * 1000
+        function = self._function.get()
+        action = self._action.get()
+        if function:
+            self.functions.setdefault(function, OperationStats()).record(elapsed_ms)
+        if action:
+            self.actions[action].record(elapsed_ms)
+        if elapsed_ms >= self.slow_query_ms:
+            self.slow_queries.append({"ms": round(elapsed_ms, 3), "function": function, "action": action,
+                                      "statement": statement})
+            logger.warning("Slow query (%.1f ms) in %s: %s", elapsed_ms, function or action or "?", statement)
+
+    def report(self):
+        return {
+            "actions": {label: stats.as_dict() for label, stats in self.actions.items()},
+            "functions": {name: stats.as_dict() for name, stats in self.functions.items()},
+            "slow_queries": list(self.slow_queries)
+        }
+
+    def dump(self, path):
+        """Write report() to path as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def format_report(self):
+        lines = []
+        for title, table in (("CLI action", self.actions), ("crud function", self.functions)):
+            if not table:
+                continue
+            lines.append(f"{title:<40} {'calls':>6} {'stmts':>6} {'total ms':>10} {'max ms':>9}")
+            for name, stats in sorted(table.items(), key=lambda item: -item[1].total_ms):
+                calls = stats.calls if stats.calls else "-"
+                lines.append(f"{name:<40} {calls:>6} {stats.statements:>6} {stats.total_ms:>10.2f} {stats.max_ms:>9.2f}")
+            lines.append("")
+        if self.slow_queries:
+            lines.append(f"Slow queries (>= {self.slow_query_ms} ms):")
+            for query in self.slow_queries:
+                lines.append(f"{query['ms']:>9.1f} ms  {query['function'] or query['action']}: {query['statement']}")
+        return "\n".join(lines).rstrip() or "No statements recorded."
+
+def _rebind(replacements):
+    """Point every module attribute bound to a key of replacements at its value."""
+    for module in list(sys.modules.values()):
+        namespace = getattr(module, "__dict__", None)
+        if not namespace:
+            continue
+        for name, value in list(namespace.items()):
+            if inspect.isfunction(value) and value in replacements:
+                namespace[name] = replacements[value]
+
+PROFILER = QueryProfiler()
@@ -0,0 +1,71 @@
+"""Book counts per genre, publisher, author and decade.
+
+On SQLite the counts come from the book_stats summary table, which triggers
+keep current on every write to books; elsewhere (or with live=True) they are
+computed with GROUP BY over books. Either way nothing is counted in Python.
+"""
+from sqlalchemy import Integer, cast, func, select
+from models import Author, Publisher, Book, BookStat
+
+REPORT_LIMIT = 20
+
+def _use_summary(session, live):
+    return not live and session.get_bind().dialect.name == "sqlite"
+
+def _rows(session, statement, limit):
+    if limit:
+        statement = statement.limit(limit)
+    return [(label, count) for label, count in session.execute(statement)]
+
+def books_per_genre(session, limit=REPORT_LIMIT, live=False):
+    """(genre, count) pairs, largest first."""
+    if _use_summary(session, live):
+        count = BookStat.book_count
+        statement = select(BookStat.key, count).where(BookStat.dimension == "genre")
+        return _rows(session, statement.order_by(count.desc(), BookStat.key), limit)
+    count = func.count(Book.id)
+    statement = select(Book.genre, count).group_by(Book.genre)
+    return _rows(session, statement.order_by(count.desc(), Book.genre), limit)
+
+def books_per_decade(session, limit=None, live=False):
+    """(decade, count) pairs in chronological order, e.g. (1990, 12)."""
+    if _use_summary(session, live):
+        decade = cast(BookStat.key, Integer)
+        statement = select(decade, BookStat.book_count).where(BookStat.dimension == "decade")
+        return _rows(session, statement.order_by(decade), limit)
+    decade = Book.publication_year // 10 * 10
+    statement = select(decade, func.count(Book.id)).group_by(decade)
+    return _rows(session, statement.order_by(decade), limit)
+
+def books_per_publisher(session, limit=REPORT_LIMIT, live=False):
+    """(publisher name, count) pairs, largest first."""
+    if _use_summary(session, live):
+        count = BookStat.book_count
+        statement = (select(Publisher.name, count)
+                     .join(Publisher, Publisher.id == cast(BookStat.key, Integer))
+                     .where(BookStat.dimension == "publisher"))
+        return _rows(session, statement.order_by(count.desc(), Publisher.name), limit)
+    count = func.count(Book.id)
+    statement = select(Publisher.name, count).join(Book, Book.publisher_id == Publisher.id).group_by(Publisher.id)
+    return _rows(session, statement.order_by(count.desc(), Publisher.name), limit)
+
+def books_per_author(session, limit=REPORT_LIMIT, live=False):
+    """(author full name, count) pairs, largest first."""
+    full_name = Author.first_name + " " + Author.last_name
+    if _use_summary(session, live):
+        count = BookStat.book_count
+        statement = (select(full_name, count)
+                     .join(Author, Author.id == cast(BookStat.key, Integer))
+                     .where(BookStat.dimension == "author"))
+        return _rows(session, statement.order_by(count.desc(), Author.last_name, Author.first_name), limit)
+    count = func.count(Book.id)
+    statement = select(full_name, count).join(Book, Book.author_id == Author.id).group_by(Author.id)
+    return _rows(session, statement.order_by(count.desc(), Author.last_name, Author.first_name), limit)
+
+# Report name -> function; the menu titles live in main.REPORT_MENU.
+REPORTS = {
+    "genre": books_per_genre,
+    "publisher": books_per_publisher,
+    "author": books_per_author,
+    "decade": books_per_decade
+}
@@ -0,0 +1,389 @@
+"""Read-only columnar snapshots of the catalog, browsed without the ORM.
+
+export_snapshot() writes every table into one file. Each column is a packed
+array: integers as int64, strings as uint32 indexes into a shared table of
+interned UTF-8 strings. Rows are stored in id order, and each lookup column
+gets a sorted permutation. open_snapshot() memory-maps the file, so opening
+costs a header read and rows are paged in by the OS as they are touched.
+Rows come back as small __slots__ views that read their columns on access.
+
+The functions below mirror the read side of crud.py, with a Snapshot in
+place of the session, so main can serve the menus and subcommands from a
+snapshot (main.py --snapshot FILE). Every write raises ValueError.
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+MAGIC = b"LIBSNAP1"
+HEADER = struct.Struct("<8sI")
+NULL = 0xFFFFFFFF  # string index of a NULL value
+PAGE_SIZE = 50
+REPORT_LIMIT = 20
+READ_ONLY = "The snapshot is read-only."
+
+TABLES = ["authors", "publishers", "books"]
+# table -> columns with a sorted permutation for lookups
+INDEXES = {
+    "authors": [("first_name", "last_name")],
+    "publishers": [("name",)],
+    "books": [("title",), ("author_id",), ("publisher_id",)]
+}
+
+def _align(n):
+    return (n + 7) & ~7
+
+def export_snapshot(session, path):
+    """Write the catalog behind session to path as a snapshot file; return {table: row count}.
+
+    The file is written next to path and moved into place, so readers of an
+    older snapshot at path are not disturbed.
+    """
+    from sqlalchemy import select
+    from models import Base
+    strings = {}
+    sections = []  # (name, array), in file order
+    tables = {}
+    for name in TABLES:
+        table = Base.metadata.tables[name]
+        columns = {}
+        values = {}
+        for column in table.columns:
+            if column.type.python_type is int:
+                data = array("q")
+            else:
+                data = array("I")
+            columns[column.name] = data
+        arrays = list(columns.values())
+        # Through the mapper, so book_count is counted where no trigger keeps the column.
+        model = next(m.class_ for m in Base.registry.mappers if m.local_table is table)
+        statement = select(*(getattr(model, c) for c in columns)).order_by(table.c.id)
+        for row in session.execute(statement):
+            for data, value in zip(arrays, row):
+                if data.typecode == "q":
+                    data.append(value)
+                else:
+                    data.append(NULL if value is None else strings.setdefault(value, len(strings)))
+        string_list = list(strings)
+        for key, data in columns.items():
+            values[key] = data if data.typecode == "q" else [None if i == NULL else string_list[i] for i in data]
+        n_rows = len(columns["id"])
+        meta = {"rows": n_rows, "columns": {}, "indexes": {}}
+        for key, data in columns.items():
+            meta["columns"][key] = data.typecode
+            sections.append((f"{name}.{key}", data))
+        for index in INDEXES[name]:
+            order = sorted(range(n_rows), key=lambda r: tuple(values[c][r] for c in index) + (values["id"][r],))
+            sections.append((f"{name}.index.{','.join(index)}", array("I", order)))
+            meta["indexes"][",".join(index)] = list(index)
+        tables[name] = meta
+    offsets = array("Q", [0])
+    blob = bytearray()
+    for value in strings:
+        blob += value.encode("utf-8")
+        offsets.append(len(blob))
+    sections += [("strings.offsets", offsets), ("strings.data", blob)]
+
+    layout = {}
+    position = 0
+    for name, data in sections:
+        size = len(data) * (data.itemsize if isinstance(data, array) else 1)
+        layout[name] = [position, size]
+        position = _align(position + size)
+    header = json.dumps({"version": 1, "tables": tables, "sections": layout}).encode("utf-8")
+    data_start = _align(HEADER.size + len(header))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(header)) + header)
+        for name, data in sections:
+            f.seek(data_start + layout[name][0])
+            f.write(data.tobytes() if isinstance(data, array) else data)
+        f.truncate(data_start + position)
+    os.replace(tmp_path, path)
+    return {name: meta["rows"] for name, meta in tables.items()}
+
+class RowView:
+    """One row of a snapshot table; columns are read from the mapped file on access."""
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        object.__setattr__(self, "_table", table)
+        object.__setattr__(self, "_row", row)
+
+    def __setattr__(self, name, value):
+        raise ValueError(READ_ONLY)
+
+    @property
+    def column_names(self):
+        return self._table.column_names
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other._table is self._table and other._row == self._row
+
+    def __hash__(self):
+        return hash((id(self._table), self._row))
+
+    def __repr__(self):
+        values = ", ".join(f"{c}={getattr(self, c)!r}" for c in self._table.column_names)
+        return f"{type(self).__name__}({values})"
+
+class AuthorView(RowView):
+    __slots__ = ()
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+class PublisherView(RowView):
+    __slots__ = ()
+
+class BookView(RowView):
+    __slots__ = ()
+
+    @property
+    def author(self):
+        return self._table.snapshot.authors.find(self.author_id)
+
+    @property
+    def publisher(self):
+        return self._table.snapshot.publishers.find(self.publisher_id)
+
+VIEWS = {"authors": AuthorView, "publishers": PublisherView, "books": BookView}
+
+def _column_property(table, column):
+    data = table.columns[column]
+    if data.format == "q":
+        return property(lambda self: data[self._row])
+    string = table.snapshot.string
+    return property(lambda self: string(data[self._row]))
+
+class SnapshotTable:
+    def __init__(self, snapshot, name, meta):
+        self.snapshot = snapshot
+        self.name = name
+        self.rows = meta["rows"]
+        self.column_names = list(meta["columns"])
+        self.columns = {c: snapshot.section(f"{name}.{c}", typecode) for c, typecode in meta["columns"].items()}
+        self.indexes = {tuple(columns): snapshot.section(f"{name}.index.{key}", "I")
+                        for key, columns in meta["indexes"].items()}
+        namespace = {"__slots__": ()}
+        namespace.update({c: _column_property(self, c) for c in self.column_names})
+        self.view = type(VIEWS[name].__name__.replace("View", "Row"), (VIEWS[name],), namespace)
+
+    def value(self, column, row):
+        raw = self.columns[column][row]
+        return raw if self.columns[column].format == "q" else self.snapshot.string(raw)
+
+    def find(self, id):
+        """The row with this id, or None."""
+        ids = self.columns["id"]
+        row = bisect_left(ids, id)
+        return self.view(self, row) if row < self.rows and ids[row] == id else None
+
+    def page(self, after_id=0, page_size=PAGE_SIZE):
+        start = bisect_right(self.columns["id"], after_id)
+        return [self.view(self, row) for row in range(start, min(start + page_size, self.rows))]
+
+    def __iter__(self):
+        return (self.view(self, row) for row in range(self.rows))
+
+    def lookup(self, columns, values):
+        """Rows whose columns equal values, in id order, via the index on columns."""
+        order = self.indexes[columns]
+        def key(row):
+            return tuple(self.value(c, row) for c in columns)
+        start = bisect_left(order, values, key=key)
+        end = bisect_right(order, values, lo=start, key=key)
+        return [self.view(self, row) for row in order[start:end]]
+
+class Snapshot:
+    """A memory-mapped snapshot file. Also stands in for the session in main's read paths."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a library snapshot.")
+        self._header = json.loads(self._map[HEADER.size:HEADER.size + header_size])
+        self._data_start = _align(HEADER.size + header_size)
+        self._views = []
+        self.info = {}
+        self._string_offsets = self.section("strings.offsets", "Q")
+        self._string_data = self.section("strings.data", "B")
+        self.tables = {name: SnapshotTable(self, name, meta) for name, meta in self._header["tables"].items()}
+        self.authors = self.tables["authors"]
+        self.publishers = self.tables["publishers"]
+        self.books = self.tables["books"]
+
+    def section(self, name, typecode):
+        offset, size = self._header["sections"][name]
+        start = self._data_start + offset
+        view = memoryview(self._map)[start:start + size].cast(typecode)
+        self._views.append(view)
+        return view
+
+    def string(self, index):
+        if index == NULL:
+            return None
+        return str(self._string_data[self._string_offsets[index]:self._string_offsets[index + 1]], "utf-8")
+
+    # Session stand-ins, so unit_of_work/persist and the menus' commits work unchanged.
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def flush(self):
+        raise ValueError(READ_ONLY)
+
+    def close(self):
+        pass  # the menus close their session after every action; the file stays mapped for the next one
+
+    def release(self):
+        """Unmap the file; the snapshot cannot be read afterwards."""
+        if self._map is None:
+            return
+        for view in self._views:
+            view.release()
+        self._map.close()
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def open_snapshot(path):
+    return Snapshot(path)
+
+def _read_only(*args, **kwargs):
+    raise ValueError(READ_ONLY)
+
+def _no_search(snapshot, query, limit=None):
+    raise ValueError("Search needs the database; snapshots have no full-text index.")
+
+create_author = create_publisher = create_book = _read_only
+delete_author = delete_publisher = delete_book = _read_only
+search_authors = search_books = _no_search
+
+def get_all_authors(snapshot):
+    return list(snapshot.authors)
+
+def get_authors_page(snapshot, after_id=0, page_size=PAGE_SIZE):
+    return snapshot.authors.page(after_id, page_size)
+
+def iter_authors(snapshot, page_size=PAGE_SIZE):
+    return iter(snapshot.authors)
+
+def find_author_by_id(snapshot, id):
+    return snapshot.authors.find(id)
+
+def find_author_by_name(snapshot, full_name):
+    parts = full_name.split()
+    first_name = parts[0]
+    last_name = ' '.join(parts[1:]) if len(parts) > 1 else ''
+    rows = snapshot.authors.lookup(("first_name", "last_name"), (first_name, last_name))
+    return rows[0] if rows else None
+
+def get_books_by_author(snapshot, author_id):
+    return snapshot.books.lookup(("author_id",), (author_id,))
+
+def _related_page(rows, after_id, page_size):
+    start = bisect_right(rows, after_id, key=lambda row: row.id)
+    return rows[start:start + page_size]
+
+def get_books_by_author_page(snapshot, author_id, after_id=0, page_size=PAGE_SIZE):
+    return _related_page(get_books_by_author(snapshot, author_id), after_id, page_size)
+
+def iter_books_by_author(snapshot, author_id, page_size=PAGE_SIZE):
+    return iter(get_books_by_author(snapshot, author_id))
+
+def get_all_publishers(snapshot):
+    return list(snapshot.publishers)
+
+def get_publishers_page(snapshot, after_id=0, page_size=PAGE_SIZE):
+    return snapshot.publishers.page(after_id, page_size)
+
+def iter_publishers(snapshot, page_size=PAGE_SIZE):
+    return iter(snapshot.publishers)
+
+def find_publisher_by_id(snapshot, id):
+    return snapshot.publishers.find(id)
+
+def find_publisher_by_name(snapshot, name):
+    rows = snapshot.publishers.lookup(("name",), (name,))
+    return rows[0] if rows else None
+
+def get_books_by_publisher(snapshot, publisher_id):
+    return snapshot.books.lookup(("publisher_id",), (publisher_id,))
+
+def get_books_by_publisher_page(snapshot, publisher_id, after_id=0, page_size=PAGE_SIZE):
+    return _related_page(get_books_by_publisher(snapshot, publisher_id), after_id, page_size)
+
+def iter_books_by_publisher(snapshot, publisher_id, page_size=PAGE_SIZE):
+    return iter(get_books_by_publisher(snapshot, publisher_id))
+
+def get_all_books(snapshot):
+    return list(snapshot.books)
+
+get_all_books_with_relations = get_all_books
+
+def get_books_page(snapshot, after_id=0, page_size=PAGE_SIZE):
+    return snapshot.books.page(after_id, page_size)
+
+def iter_books(snapshot, page_size=PAGE_SIZE):
+    return iter(snapshot.books)
+
+def find_book_by_id(snapshot, id):
+    return snapshot.books.find(id)
+
+find_book_with_relations_by_id = find_book_by_id
+
+def find_book_by_title(snapshot, title):
+    rows = snapshot.books.lookup(("title",), (title,))
+    return rows[0] if rows else None
+
+find_book_with_relations_by_title = find_book_by_title
+
+def get_book_relations(snapshot, book_id):
+    book = snapshot.books.find(book_id)
+    if book:
+        return book.author, book.publisher
+    return None, None
+
+# Reports, counted straight from the columns; the same rows, in the same order, as reports.py.
+def _top(counts, label, limit, order=None):
+    order = order or (lambda key: label(key))
+    keys = sorted(counts, key=lambda key: (-counts[key], order(key)))
+    return [(label(key), counts[key]) for key in (keys[:limit] if limit else keys)]
+
+def books_per_genre(snapshot, limit=REPORT_LIMIT, live=False):
+    return _top(Counter(snapshot.books.columns["genre"]), snapshot.string, limit)
+
+def books_per_publisher(snapshot, limit=REPORT_LIMIT, live=False):
+    return _top(Counter(snapshot.books.columns["publisher_id"]), lambda id: snapshot.publishers.find(id).name, limit)
+
+def books_per_author(snapshot, limit=REPORT_LIMIT, live=False):
+    authors = snapshot.authors
+    return _top(Counter(snapshot.books.columns["author_id"]), lambda id: authors.find(id).full_name, limit,
+                lambda id: (authors.find(id).last_name, authors.find(id).first_name))
+
+def books_per_decade(snapshot, limit=None, live=False):
+    counts = Counter(year // 10 * 10 for year in snapshot.books.columns["publication_year"])
+    rows = sorted(counts.items())
+    return rows[:limit] if limit else rows
+
+REPORTS = {
+    "genre": books_per_genre,
+    "publisher": books_per_publisher,
+    "author": books_per_author,
+    "decade": books_per_decade
+}